@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, database
-from .order_router import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+from datetime import datetime
+import csv
+import io
+from . import models, schemas, database, stats, profiler, events, versions
+from .auth_router import get_current_user, get_stream_user
+from .config import settings
+from .pagination import paginate_by_id, paginate_newest_first
+from .responses import json_response, dump_json
 
 router = APIRouter()
 
@@ -13,7 +21,7 @@ def get_db():
     finally:
         db.close()
 
-def require_admin(current_user: models.User = Depends(get_current_user)):
+def require_admin(current_user: schemas.User = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -21,57 +29,198 @@ def require_admin(current_user: models.User = Depends(get_current_user)):
         )
     return current_user
 
-@router.get("/admin/users", response_model=List[schemas.User])
-def list_all_users(admin_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
-    users = db.query(models.User).all()
-    return users
+def require_stream_admin(current_user: schemas.User = Depends(get_stream_user)):
+    # require_admin for streams, without a session held for the stream's lifetime
+    return require_admin(current_user)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CSV_COLUMNS = [
+    "order_id", "user_id", "created_at", "status", "total_price",
+    "product_id", "size", "quantity", "unit_price", "line_total", "customizations",
+]
+
+def export_query(order_status: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    if order_status is not None and order_status not in models.ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {models.ORDER_STATUSES}")
+    stmt = select(models.Order).options(selectinload(models.Order.items))
+    if order_status is not None:
+        stmt = stmt.where(models.Order.status == order_status)
+    if since is not None:
+        stmt = stmt.where(models.Order.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(models.Order.created_at < until)
+    # yield_per streams from a server-side cursor where the driver has one and
+    # loads each batch's order lines with one selectin query
+    return stmt.order_by(models.Order.id).execution_options(yield_per=settings.export_batch_size)
+
+def ndjson_chunk(orders) -> bytes:
+    return b"".join(dump_json(schemas.Order, order) + b"\n" for order in orders)
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue().encode()
+
+def csv_chunk(orders) -> bytes:
+    """One row per order line; an order without lines gets a single row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for order in orders:
+        head = [order.id, order.user_id, order.created_at.isoformat(), order.status, order.total_price]
+        for line in order.items or [None]:
+            if line is None:
+                writer.writerow(head + [""] * 6)
+            else:
+                writer.writerow(head + [
+                    line.product_id, line.size, line.quantity, line.unit_price, line.line_total,
+                    ";".join(line.customizations or []),
+                ])
+    return buffer.getvalue().encode()
+
+def export_response(body, export_format: str):
+    filename = f"orders-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def sales_query(product_id: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Units, revenue and order count per product and size, excluding cancelled orders"""
+    quantity = func.sum(models.OrderItem.quantity).label("quantity")
+    stmt = select(
+        models.OrderItem.product_id,
+        models.CoffeeProduct.name.label("product_name"),
+        models.OrderItem.size,
+        quantity,
+        func.coalesce(func.sum(models.OrderItem.line_total), 0.0).label("revenue"),
+        func.count(func.distinct(models.OrderItem.order_id)).label("orders"),
+    ).join(
+        models.Order, models.Order.id == models.OrderItem.order_id
+    ).outerjoin(
+        models.CoffeeProduct, models.CoffeeProduct.id == models.OrderItem.product_id
+    ).where(models.Order.status != "cancelled")
+    if product_id is not None:
+        stmt = stmt.where(models.OrderItem.product_id == product_id)
+    if since is not None:
+        stmt = stmt.where(models.Order.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(models.Order.created_at < until)
+    return stmt.group_by(
+        models.OrderItem.product_id, models.CoffeeProduct.name, models.OrderItem.size
+    ).order_by(quantity.desc(), models.OrderItem.product_id)
+
+async def run_profile(seconds: float, interval_ms: float, slow_ms: Optional[float], top: int, profile_format: str):
+    try:
+        profile = await profiler.profile(seconds, interval_ms / 1000, slow_ms)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    report = profile.report(top)
+    if profile_format == "collapsed":
+        return PlainTextResponse(report["collapsed"])
+    return report
+
+@router.get("/admin/users", response_model=schemas.UserPage)
+def list_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    admin_user: schemas.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    users, next_cursor = paginate_by_id(db.query(models.User), models.User.id, cursor, limit)
+    return json_response(schemas.UserPage, {"items": users, "next_cursor": next_cursor})
 
 @router.patch("/admin/users/{user_id}/admin")
-def toggle_admin_status(user_id: int, admin_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
+def toggle_admin_status(user_id: int, admin_user: schemas.User = Depends(require_admin), db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_admin = not user.is_admin
+    versions.auth.bump(db)
     db.commit()
+    versions.auth.invalidate()
     
     return {"message": f"User {user.username} admin status: {user.is_admin}"}
 
 @router.patch("/admin/users/{user_id}/active")
-def toggle_user_status(user_id: int, admin_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
+def toggle_user_status(user_id: int, admin_user: schemas.User = Depends(require_admin), db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = not user.is_active
+    versions.auth.bump(db)
     db.commit()
+    versions.auth.invalidate()
     
     return {"message": f"User {user.username} active status: {user.is_active}"}
 
-@router.get("/admin/orders", response_model=List[schemas.Order])
-def list_all_orders(admin_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
-    orders = db.query(models.Order).all()
-    return [
-        schemas.Order(
-            id=order.id,
-            user_id=order.user_id,
-            items=[schemas.OrderItem(**item) for item in order.items],
-            total_price=order.total_price,
-            status=order.status,
-            created_at=order.created_at.isoformat()
-        ) for order in orders
-    ]
+@router.get("/admin/orders", response_model=schemas.OrderPage)
+def list_all_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    admin_user: schemas.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Order).options(selectinload(models.Order.items))
+    orders, next_cursor = paginate_newest_first(query, models.Order.created_at, models.Order.id, cursor, limit)
+    return json_response(schemas.OrderPage, {"items": orders, "next_cursor": next_cursor})
 
-@router.get("/admin/stats")
-def get_admin_stats(admin_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
-    total_users = db.query(models.User).count()
-    total_products = db.query(models.CoffeeProduct).count()
-    total_orders = db.query(models.Order).count()
-    pending_orders = db.query(models.Order).filter(models.Order.status == "pending").count()
+@router.get("/admin/orders/export")
+def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin_user: schemas.User = Depends(require_admin)
+):
+    stmt = export_query(status, since, until)
+    chunk = csv_chunk if format == "csv" else ndjson_chunk
     
-    return {
-        "total_users": total_users,
-        "total_products": total_products,
-        "total_orders": total_orders,
-        "pending_orders": pending_orders
-    }
+    def body():
+        # Own session: the stream outlives the request's dependencies
+        db = database.SessionLocal()
+        try:
+            if format == "csv":
+                yield csv_header()
+            for orders in db.scalars(stmt).partitions():
+                yield chunk(orders)
+        finally:
+            db.close()
+    
+    return export_response(body(), format)
+
+@router.get("/admin/orders/events")
+async def all_order_events(admin_user: schemas.User = Depends(require_stream_admin)):
+    # Server-Sent Events: every order status change, for the whole shop
+    return events.stream_response(events.broker.subscribe())
+
+@router.get("/admin/sales", response_model=schemas.SalesReport)
+def get_sales(
+    product_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin_user: schemas.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    rows = db.execute(sales_query(product_id, since, until)).all()
+    return json_response(schemas.SalesReport, {"items": rows})
+
+@router.get("/admin/stats")
+def get_admin_stats(admin_user: schemas.User = Depends(require_admin), db: Session = Depends(get_db)):
+    # Counters maintained by the write paths; no table scans
+    return stats.read(db.execute(stats.counters_query()).all())
+
+@router.get("/admin/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=settings.profiler_max_seconds),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    slow_ms: Optional[float] = Query(None, gt=0),
+    top: int = Query(15, ge=1, le=100),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    admin_user: schemas.User = Depends(require_admin)
+):
+    # Samples every thread of this worker; "collapsed" returns flamegraph input
+    return await run_profile(seconds, interval_ms, slow_ms, top, format)
@@ -0,0 +1,130 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Optional
+from datetime import datetime
+from . import models, schemas, database, stats, events, versions
+from .async_auth_router import get_current_user, get_stream_user, get_db
+from .admin_router import sales_query, export_query, ndjson_chunk, csv_header, csv_chunk, export_response, run_profile
+from .config import settings
+from .pagination import after_id, id_page, before_created, created_page
+from .responses import json_response
+
+router = APIRouter()
+
+async def require_admin(current_user: schemas.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
+async def require_stream_admin(current_user: schemas.User = Depends(get_stream_user)):
+    return await require_admin(current_user)
+
+async def _get_user_or_404(db: AsyncSession, user_id: int):
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+@router.get("/admin/users", response_model=schemas.UserPage)
+async def list_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    admin_user: schemas.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    rows = (await db.scalars(after_id(select(models.User), models.User.id, cursor, limit))).all()
+    users, next_cursor = id_page(rows, models.User.id, limit)
+    return json_response(schemas.UserPage, {"items": users, "next_cursor": next_cursor})
+
+@router.patch("/admin/users/{user_id}/admin")
+async def toggle_admin_status(user_id: int, admin_user: schemas.User = Depends(require_admin), db: AsyncSession = Depends(get_db)):
+    user = await _get_user_or_404(db, user_id)
+    
+    user.is_admin = not user.is_admin
+    await db.run_sync(versions.auth.bump)
+    await db.commit()
+    versions.auth.invalidate()
+    
+    return {"message": f"User {user.username} admin status: {user.is_admin}"}
+
+@router.patch("/admin/users/{user_id}/active")
+async def toggle_user_status(user_id: int, admin_user: schemas.User = Depends(require_admin), db: AsyncSession = Depends(get_db)):
+    user = await _get_user_or_404(db, user_id)
+    
+    user.is_active = not user.is_active
+    await db.run_sync(versions.auth.bump)
+    await db.commit()
+    versions.auth.invalidate()
+    
+    return {"message": f"User {user.username} active status: {user.is_active}"}
+
+@router.get("/admin/orders", response_model=schemas.OrderPage)
+async def list_all_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    admin_user: schemas.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    stmt = before_created(select(models.Order).options(selectinload(models.Order.items)), models.Order.created_at, models.Order.id, cursor, limit)
+    orders, next_cursor = created_page((await db.scalars(stmt)).all(), models.Order.created_at, models.Order.id, limit)
+    return json_response(schemas.OrderPage, {"items": orders, "next_cursor": next_cursor})
+
+@router.get("/admin/orders/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin_user: schemas.User = Depends(require_admin)
+):
+    stmt = export_query(status, since, until)
+    chunk = csv_chunk if format == "csv" else ndjson_chunk
+    
+    async def body():
+        # Own session: the stream outlives the request's dependencies
+        async with database.AsyncSessionLocal() as db:
+            if format == "csv":
+                yield csv_header()
+            result = await db.stream_scalars(stmt)
+            async for orders in result.partitions():
+                yield chunk(orders)
+    
+    return export_response(body(), format)
+
+@router.get("/admin/orders/events")
+async def all_order_events(admin_user: schemas.User = Depends(require_stream_admin)):
+    # Server-Sent Events: every order status change, for the whole shop
+    return events.stream_response(events.broker.subscribe())
+
+@router.get("/admin/sales", response_model=schemas.SalesReport)
+async def get_sales(
+    product_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin_user: schemas.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    rows = (await db.execute(sales_query(product_id, since, until))).all()
+    return json_response(schemas.SalesReport, {"items": rows})
+
+@router.get("/admin/stats")
+async def get_admin_stats(admin_user: schemas.User = Depends(require_admin), db: AsyncSession = Depends(get_db)):
+    # Counters maintained by the write paths; no table scans
+    return stats.read((await db.execute(stats.counters_query())).all())
+
+@router.get("/admin/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=settings.profiler_max_seconds),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    slow_ms: Optional[float] = Query(None, gt=0),
+    top: int = Query(15, ge=1, le=100),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    admin_user: schemas.User = Depends(require_admin)
+):
+    # Samples every thread of this worker; "collapsed" returns flamegraph input
+    return await run_profile(seconds, interval_ms, slow_ms, top, format)
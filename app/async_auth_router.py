@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas, database, stats, versions
+from .auth_router import (
+    oauth2_scheme, create_access_token, stream_token,
+    decode_token, user_cache, cache_user, check_active, credentials_exception,
+)
+from .config import settings
+from .hashing import hash_password_async, verify_and_update_async
+from .middleware import limiter
+
+router = APIRouter()
+
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+async def get_user(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
+    if not user:
+        return False
+    # bcrypt runs on the bounded hashing executor, off the event loop
+    valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+async def current_auth_version(db: AsyncSession):
+    if versions.auth.stale():
+        await db.run_sync(versions.auth.refresh)
+    version, _ = versions.auth.snapshot()
+    return version
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> schemas.User:
+    username = decode_token(token)
+    version = await current_auth_version(db)
+    user = user_cache.get(username)
+    if user is None:
+        db_user = await get_user(db, username)
+        if db_user is None:
+            raise credentials_exception()
+        user = cache_user(db_user, version)
+    return check_active(user)
+
+async def get_stream_user(token: str = Depends(stream_token)) -> schemas.User:
+    username = decode_token(token)
+    async with database.AsyncSessionLocal() as db:
+        version = await current_auth_version(db)
+        user = user_cache.get(username)
+        if user is None:
+            db_user = await get_user(db, username)
+            if db_user is None:
+                raise credentials_exception()
+            user = cache_user(db_user, version)
+    return check_active(user)
+
+@router.post("/auth/token")
+@limiter.limit(f"{settings.rate_limit_requests}/minute")
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(data={"sub": user.username})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/auth/register", response_model=schemas.User)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await get_user(db, user.username)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    hashed_password = await hash_password_async(user.password)
+    new_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password,
+        is_active=True,
+        is_admin=False
+    )
+    db.add(new_user)
+    await db.run_sync(stats.bump, {"users": 1})
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+@router.get("/auth/me", response_model=schemas.User)
+async def read_users_me(current_user: schemas.User = Depends(get_current_user)):
+    return current_user
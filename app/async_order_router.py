@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Optional
+from . import models, schemas, database, pricing, stats, events
+from .async_auth_router import get_current_user, get_stream_user, get_db
+from .middleware import limiter
+from .order_router import (
+    new_order, check_batch_size, batch_product_ids, price_batch, bulk_insert_orders, batch_item_rows, batch_counters,
+    batch_response, check_order_visible, change_status,
+)
+from .pagination import before_created, created_page
+from .responses import json_response
+
+router = APIRouter()
+
+@router.post("/orders", response_model=schemas.Order)
+@limiter.limit("10/minute")
+async def create_order(request: Request, order: schemas.OrderCreate, current_user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # The pricing engine is shared with the sync stack and runs on this session's connection
+    lines, total_price = await db.run_sync(lambda session: pricing.price_order(order.items, session))
+    
+    db_order = new_order(current_user.id, lines, total_price)
+    db.add(db_order)
+    await db.run_sync(stats.bump, stats.order_created(total_price))
+    await db.commit()
+    # Sessions don't expire on commit: the order and its lines are still loaded
+    
+    return json_response(schemas.Order, db_order)
+
+@router.post("/orders/batch", response_model=schemas.OrderBatchResponse)
+@limiter.limit("10/minute")
+async def create_order_batch(request: Request, batch: schemas.OrderBatchCreate, current_user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    check_batch_size(batch)
+    
+    product_ids = batch_product_ids(batch)
+    tables = await db.run_sync(lambda session: pricing.get_price_tables(session, product_ids))
+    rows, failures = price_batch(batch, current_user.id, tables)
+    
+    created = []
+    if rows:
+        created = (await db.execute(bulk_insert_orders(), [values for _, values, _ in rows])).all()
+        item_rows = batch_item_rows(rows, created)
+        if item_rows:
+            await db.execute(insert(models.OrderItem), item_rows)
+        await db.run_sync(stats.bump, batch_counters(rows))
+        await db.commit()
+    
+    return batch_response(rows, created, failures)
+
+@router.get("/orders", response_model=schemas.OrderPage)
+async def get_user_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    stmt = select(models.Order).options(selectinload(models.Order.items)).where(models.Order.user_id == current_user.id)
+    rows = (await db.scalars(before_created(stmt, models.Order.created_at, models.Order.id, cursor, limit))).all()
+    orders, next_cursor = created_page(rows, models.Order.created_at, models.Order.id, limit)
+    return json_response(schemas.OrderPage, {"items": orders, "next_cursor": next_cursor})
+
+@router.get("/orders/{order_id}", response_model=schemas.Order)
+async def get_order(order_id: int, current_user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    order = (await db.scalars(select(models.Order).options(selectinload(models.Order.items)).where(
+        models.Order.id == order_id,
+        models.Order.user_id == current_user.id
+    ))).first()
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return json_response(schemas.Order, order)
+
+@router.get("/orders/{order_id}/events")
+async def order_events(order_id: int, current_user: schemas.User = Depends(get_stream_user)):
+    # Server-Sent Events: the current status, then each change until completed
+    # or cancelled. Subscribed before the read so no change falls in between.
+    subscription = events.broker.subscribe(order_id)
+    try:
+        # Own session: the stream outlives the request's dependencies
+        async with database.AsyncSessionLocal() as db:
+            order = await db.get(models.Order, order_id)
+        check_order_visible(order, current_user)
+    except BaseException:
+        subscription.close()
+        raise
+    return events.stream_response(subscription, events.order_event(order))
+
+@router.patch("/orders/{order_id}/status")
+async def update_order_status(order_id: int, status: str, current_user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    order = await db.get(models.Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    valid_statuses = models.ORDER_STATUSES
+    if status not in valid_statuses:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
+    
+    # Another change committed since the read: re-read and apply on top of it
+    previous_status = order.status
+    while (await db.execute(change_status(order_id, previous_status, status))).rowcount != 1:
+        order = await db.get(models.Order, order_id, populate_existing=True)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        previous_status = order.status
+    await db.run_sync(stats.bump, stats.status_changed(previous_status, status, order.total_price))
+    event = events.order_event(order, previous_status)
+    await db.commit()
+    events.publish(event)
+    
+    return {"message": f"Order {order_id} status updated to {status}"}
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from . import schemas, models, database, search, stats, versions
+from .middleware import limiter
+from .pagination import after_id, id_page
+from .responses import dump_json, json_response
+from .product_router import catalog_cache, catalog_result, store_catalog_body, invalidate_catalog
+
+router = APIRouter()
+
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+async def _catalog_response(request: Request, db: AsyncSession, key, render):
+    """Async counterpart of product_router._catalog_response sharing its cache and validators"""
+    if versions.catalog.stale():
+        await db.run_sync(versions.catalog.refresh)
+    version, last_modified = versions.catalog.snapshot()
+    body = catalog_cache.get(key)
+    if body is None:
+        body = await render()
+        store_catalog_body(key, version, body)
+    return catalog_result(request, version, last_modified, body)
+
+async def _get_product_or_404(db: AsyncSession, product_id: int):
+    product = await db.get(models.CoffeeProduct, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.get("/products", response_model=schemas.ProductPage)
+@limiter.limit("100/minute")
+async def list_products(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    available: Optional[bool] = True,
+    db: AsyncSession = Depends(get_db)
+):
+    async def render():
+        stmt = select(models.CoffeeProduct)
+        
+        if category:
+            stmt = stmt.where(models.CoffeeProduct.category == category)
+        if featured is not None:
+            stmt = stmt.where(models.CoffeeProduct.is_featured == featured)
+        if available is not None:
+            stmt = stmt.where(models.CoffeeProduct.is_available == available)
+        
+        rows = (await db.scalars(after_id(stmt, models.CoffeeProduct.id, cursor, limit))).all()
+        products, next_cursor = id_page(rows, models.CoffeeProduct.id, limit)
+        return dump_json(schemas.ProductPage, {"items": products, "next_cursor": next_cursor})
+    
+    return await _catalog_response(request, db, ("products", cursor, limit, category, featured, available), render)
+
+@router.get("/products/categories", response_model=schemas.CategoryList)
+async def get_categories(request: Request, db: AsyncSession = Depends(get_db)):
+    async def render():
+        categories = (await db.scalars(select(models.CoffeeProduct.category).distinct())).all()
+        return schemas.CategoryList(categories=list(categories)).model_dump_json().encode()
+    
+    return await _catalog_response(request, db, ("categories",), render)
+
+@router.get("/products/search", response_model=List[schemas.CoffeeProduct])
+@limiter.limit("50/minute")
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=2),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    return json_response(List[schemas.CoffeeProduct], await db.run_sync(search.search_products, q, skip, limit))
+
+@router.get("/products/{product_id}", response_model=schemas.CoffeeProduct)
+async def get_product(request: Request, product_id: int, db: AsyncSession = Depends(get_db)):
+    async def render():
+        product = await _get_product_or_404(db, product_id)
+        return dump_json(schemas.CoffeeProduct, product)
+    
+    return await _catalog_response(request, db, ("product", product_id), render)
+
+@router.post("/products", response_model=schemas.CoffeeProduct)
+async def create_product(product: schemas.CoffeeProductCreate, db: AsyncSession = Depends(get_db)):
+    # In production, this should require admin authentication
+    db_product = models.CoffeeProduct(**product.dict())
+    db.add(db_product)
+    await db.run_sync(stats.bump, {"products": 1})
+    await db.run_sync(versions.catalog.bump)
+    await db.commit()
+    await db.refresh(db_product)
+    invalidate_catalog()
+    return json_response(schemas.CoffeeProduct, db_product)
+
+@router.put("/products/{product_id}", response_model=schemas.CoffeeProduct)
+async def update_product(product_id: int, product: schemas.CoffeeProductCreate, db: AsyncSession = Depends(get_db)):
+    # In production, this should require admin authentication
+    db_product = await _get_product_or_404(db, product_id)
+    for key, value in product.dict().items():
+        setattr(db_product, key, value)
+    await db.run_sync(versions.catalog.bump)
+    await db.commit()
+    await db.refresh(db_product)
+    invalidate_catalog()
+    return json_response(schemas.CoffeeProduct, db_product)
+
+@router.delete("/products/{product_id}")
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    # In production, this should require admin authentication
+    db_product = await _get_product_or_404(db, product_id)
+    await db.delete(db_product)
+    await db.run_sync(stats.bump, {"products": -1})
+    await db.run_sync(versions.catalog.bump)
+    await db.commit()
+    invalidate_catalog()
+    return {"detail": "Product deleted"}
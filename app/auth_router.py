@@ -1,19 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+import time
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import EmailStr
-from . import models, schemas, database
+from . import models, schemas, database, metrics, stats, versions
+from .hashing import get_password_hash, hash_password_async, verify_and_update_async
+from .cache import TTLCache
 from .config import settings
 from .middleware import limiter
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 router = APIRouter()
 
+# Per-process caches for get_current_user: token → username and username → user
+# snapshot. Admin user toggles bump the shared auth version, which clears the
+# user snapshots in every worker (see app.versions).
+token_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+user_cache = versions.auth.track(TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl))
+metrics.register_cache("auth_token", token_cache)
+metrics.register_cache("auth_user", user_cache)
+
 def get_db():
     db = database.SessionLocal()
     try:
@@ -21,12 +32,6 @@ def get_db():
     finally:
         db.close()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
@@ -37,16 +42,114 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 def get_user(db, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def authenticate_user(db, username: str, password: str):
-    user = get_user(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+def credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token: str) -> str:
+    """Return the username a valid access token was issued to"""
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        username: str = payload.get("sub")
+        if username is None:
+            raise credentials_exception()
+    except JWTError:
+        raise credentials_exception()
+    # Never cache a token past its own expiry
+    ttl = settings.auth_cache_ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, username, ttl=ttl)
+    return username
+
+def cache_user(user, version) -> schemas.User:
+    """Snapshot a user read while the auth version was version"""
+    snapshot = schemas.User.model_validate(user, from_attributes=True)
+    # A toggle noticed since the read has already cleared the cache; don't
+    # put the stale row back
+    if version == versions.auth.version:
+        user_cache.set(snapshot.username, snapshot)
+    return snapshot
+
+def check_active(user: schemas.User) -> schemas.User:
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.User:
+    username = decode_token(token)
+    version, _ = versions.auth.current(db)
+    user = user_cache.get(username)
+    if user is None:
+        db_user = get_user(db, username)
+        if db_user is None:
+            raise credentials_exception()
+        user = cache_user(db_user, version)
+    return check_active(user)
+
+def stream_token(header_token: str = Depends(optional_oauth2_scheme), access_token: str = None) -> str:
+    """Bearer header, or ?access_token= for EventSource, which can't set headers"""
+    token = header_token or access_token
+    if not token:
+        raise credentials_exception()
+    return token
+
+def get_stream_user(token: str = Depends(stream_token)) -> schemas.User:
+    """get_current_user for long-lived responses: uses its own short session,
+    since a Depends(get_db) session would stay open until the stream ends"""
+    username = decode_token(token)
+    with database.SessionLocal() as db:
+        version, _ = versions.auth.current(db)
+        user = user_cache.get(username)
+        if user is None:
+            db_user = get_user(db, username)
+            if db_user is None:
+                raise credentials_exception()
+            user = cache_user(db_user, version)
+    return check_active(user)
+
+def save_password_hash(db, user, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+async def authenticate_user(db, username: str, password: str):
+    # Endpoints are async so bcrypt waits on the hashing executor without
+    # holding a request threadpool worker; DB calls still go to the threadpool.
+    user = await run_in_threadpool(get_user, db, username)
+    if not user:
+        return False
+    valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        await run_in_threadpool(save_password_hash, db, user, new_hash)
     return user
 
+def create_user(db, user: schemas.UserCreate, hashed_password: str):
+    new_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password,
+        is_active=True,
+        is_admin=False
+    )
+    db.add(new_user)
+    stats.bump(db, {"users": 1})
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
 @router.post("/auth/token")
 @limiter.limit(f"{settings.rate_limit_requests}/minute")
-def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -57,38 +160,13 @@ def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestFor
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/auth/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user(db, user.username)
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(get_user, db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
-    new_user = models.User(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_password,
-        is_active=True,
-        is_admin=False
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    hashed_password = await hash_password_async(user.password)
+    return await run_in_threadpool(create_user, db, user, hashed_password)
 
 @router.get("/auth/me", response_model=schemas.User)
-def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = get_user(db, username)
-    if user is None:
-        raise credentials_exception
-    return user
+def read_users_me(current_user: schemas.User = Depends(get_current_user)):
+    return current_user
@@ -2,10 +2,44 @@ from pydantic_settings import BaseSettings
 from typing import List
 from pydantic import validator
 import os
+import tempfile
 
 class Settings(BaseSettings):
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./coffee_shop.db")
+    # Serve API routes from async handlers on an AsyncSession (aiosqlite/asyncpg)
+    async_database: bool = os.getenv("ASYNC_DATABASE", "false").lower() == "true"
+    # Apply pending migrations when the app starts; gunicorn.conf.py turns it
+    # off so that only the master migrates, not every worker at once
+    migrate_on_startup: bool = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+    
+    # Password hashing
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_executor: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_queue: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+    
+    # Authenticated-user cache (decoded tokens and user rows)
+    auth_cache_size: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    auth_cache_ttl: int = int(os.getenv("AUTH_CACHE_TTL", "60"))
+    # Seconds a worker may trust cached users before checking for admin
+    # toggles made by other workers: the longest a deactivation or demotion
+    # can go unnoticed there (the toggling worker applies it at once); 0
+    # checks on every request
+    auth_version_check_interval: float = float(os.getenv("AUTH_VERSION_CHECK_INTERVAL", "1"))
+    
+    # Connection pool
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    
+    # SQLite tuning, applied to every new connection
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     
     # JWT Settings
     secret_key: str = os.getenv("SECRET_KEY", "your-super-secret-key")
@@ -22,12 +56,56 @@ class Settings(BaseSettings):
     # Rate Limiting
     rate_limit_requests: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
     rate_limit_window: int = 60
+    # Counter storage shared by all workers: sqlite:///<path> (one host) or redis://host:port
+    rate_limit_storage_uri: str = os.getenv(
+        "RATE_LIMIT_STORAGE_URI", "sqlite:///" + os.path.join(tempfile.gettempdir(), "coffee_shop_ratelimit.db")
+    )
+    rate_limit_strategy: str = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+    # Proxies in front of the app that append to X-Forwarded-For (1 on
+    # Heroku); the client address is the entry the outermost of them added
+    trusted_proxy_hops: int = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+    
+    # Catalog cache
+    catalog_cache_size: int = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+    catalog_cache_ttl: int = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+    # Seconds a worker may serve its cached catalog before checking for product
+    # writes made by other workers (order pricing always checks)
+    catalog_version_check_interval: float = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", "1"))
+    
+    # Orders
+    order_batch_max_size: int = int(os.getenv("ORDER_BATCH_MAX_SIZE", "100"))
+    # Orders fetched per round trip by the streaming export
+    export_batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    
+    # SQL accounting: log statements at least this slow (0 disables) and send
+    # per-request query counts/time in a Server-Timing header
+    slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+    server_timing_header: bool = os.getenv("SERVER_TIMING_HEADER", "true").lower() == "true"
+    
+    # Longest run of the admin sampling profiler (seconds)
+    profiler_max_seconds: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    
+    # Order status events (Server-Sent Events); backend "auto", "local" or "postgres"
+    order_events_backend: str = os.getenv("ORDER_EVENTS_BACKEND", "auto")
+    order_events_queue_size: int = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "16"))
+    order_events_max_subscribers: int = int(os.getenv("ORDER_EVENTS_MAX_SUBSCRIBERS", "10000"))
+    order_events_keepalive: float = float(os.getenv("ORDER_EVENTS_KEEPALIVE", "15"))
+    order_events_retry_ms: int = int(os.getenv("ORDER_EVENTS_RETRY_MS", "3000"))
     
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
     
     # Logging
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    # Rotating log file, single process only (gunicorn workers would race on
+    # rotation); empty logs to stdout only
+    log_file: str = os.getenv("LOG_FILE", "")
+    log_file_max_bytes: int = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+    log_file_backup_count: int = int(os.getenv("LOG_FILE_BACKUP_COUNT", "5"))
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Fraction of successful (< 400) request logs to keep under high RPS
+    log_success_sample_rate: float = float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", "1.0"))
     
     @validator('database_url')
     def fix_postgres_url(cls, v):
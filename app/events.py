@@ -0,0 +1,301 @@
+"""Order status events pushed to clients over Server-Sent Events.
+
+update_order_status publishes an event after its commit. The Broker fans each
+event out to the subscribers of that order and of the all-orders stream; each
+subscriber is a small bounded queue read by its SSE response, so an idle
+subscriber costs one queue and one waiting task. publish() is thread-safe:
+sync handlers publish from the threadpool and the event is handed to the event
+loop.
+
+Delivery between worker processes goes through a backend:
+  local     events reach subscribers of the publishing worker only; the
+            stand-in for a single process and for SQLite
+  postgres  LISTEN on a dedicated asyncpg connection and NOTIFY on a second
+            one (a connection runs one operation at a time); every worker
+            (the publisher included) receives each event from the database
+ORDER_EVENTS_BACKEND=auto picks postgres when DATABASE_URL is PostgreSQL.
+
+uvicorn waits for open responses before it runs the app's shutdown handlers,
+so the broker chains a SIGTERM/SIGINT handler in front of the server's and
+ends the streams as soon as the shutdown signal arrives; clients reconnect
+after the retry delay, to another worker. A worker recycled by max_requests
+gets no signal: its streams are cut when the graceful timeout expires, and
+clients reconnect the same way.
+"""
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import make_url
+from datetime import datetime
+import asyncio
+import json
+import logging
+import signal
+import threading
+import weakref
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "order_events"
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+FINAL_STATUSES = {"completed", "cancelled"}
+_ALL = "all"
+
+def order_event(order: models.Order, previous_status: str = None) -> dict:
+    return {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "previous_status": previous_status,
+        "at": datetime.utcnow().isoformat(),
+    }
+
+class Subscription:
+    def __init__(self, broker: "Broker", key):
+        self.broker = broker
+        self.key = key
+        self.queue = asyncio.Queue(maxsize=settings.order_events_queue_size)
+
+    def put(self, event):
+        if self.queue.full():
+            # A subscriber that stopped reading keeps only the newest events
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class Broker:
+    """In-process fan-out; all methods except publish() run on the event loop"""
+
+    def __init__(self):
+        self.loop = None
+        self.backend = None
+        self.closing = False
+        # Weak, so a stream that never started (client gone before the first
+        # byte) doesn't leave its subscription behind; the empty sets such
+        # streams leave are pruned by subscribe() and dispatch()
+        self.subscriptions = {}
+        self._previous_handlers = {}
+
+    def subscriber_count(self) -> int:
+        """Live subscriptions; drops the keys left empty by collected ones"""
+        count = 0
+        for key, subscriptions in list(self.subscriptions.items()):
+            if subscriptions:
+                count += len(subscriptions)
+            else:
+                del self.subscriptions[key]
+        return count
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.closing = False
+        self.backend = _make_backend(self)
+        await self.backend.start()
+        self._install_signal_handlers()
+
+    def _install_signal_handlers(self):
+        # Signal handlers can only be set from the main thread, which is where
+        # uvicorn (standalone or as gunicorn's worker) runs the app's startup
+        if threading.current_thread() is not threading.main_thread() or self._previous_handlers:
+            return
+        for sig in SHUTDOWN_SIGNALS:
+            self._previous_handlers[sig] = signal.signal(sig, self._on_shutdown_signal)
+
+    def _restore_signal_handlers(self):
+        for sig, previous in self._previous_handlers.items():
+            if signal.getsignal(sig) == self._on_shutdown_signal:
+                signal.signal(sig, previous)
+        self._previous_handlers = {}
+
+    def _on_shutdown_signal(self, signum, frame):
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.end_streams)
+        previous = self._previous_handlers.get(signum)
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            self._restore_signal_handlers()
+            signal.raise_signal(signum)
+
+    def end_streams(self):
+        self.closing = True
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.put(None)
+
+    async def stop(self):
+        self.end_streams()
+        self._restore_signal_handlers()
+        if self.backend is not None:
+            await self.backend.stop()
+        self.loop = None
+
+    def subscribe(self, order_id: int = None) -> Subscription:
+        if self.closing:
+            raise HTTPException(status_code=503, detail="Server is shutting down")
+        if self.subscriber_count() >= settings.order_events_max_subscribers:
+            raise HTTPException(status_code=503, detail="Too many event subscribers, try again later")
+        subscription = Subscription(self, _ALL if order_id is None else order_id)
+        self.subscriptions.setdefault(subscription.key, weakref.WeakSet()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscriptions.get(subscription.key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.key]
+
+    def dispatch(self, event: dict):
+        """Deliver an event to this worker's subscribers"""
+        for key in (event["order_id"], _ALL):
+            subscriptions = self.subscriptions.get(key)
+            if subscriptions is None:
+                continue
+            if not subscriptions:
+                del self.subscriptions[key]
+                continue
+            for subscription in list(subscriptions):
+                subscription.put(event)
+
+    def publish(self, event: dict):
+        """Send an event to subscribers in every worker; callable from any thread"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.backend.publish, event)
+
+class LocalBackend:
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, event: dict):
+        self.broker.dispatch(event)
+
+class PostgresBackend:
+    """NOTIFY on publish, LISTEN for delivery; reconnects with backoff"""
+
+    def __init__(self, broker: Broker, dsn: str):
+        self.broker = broker
+        self.dsn = dsn
+        self.connection = None
+        self.task = None
+        # NOTIFYs go out one at a time, in publish order, on their own connection
+        self.notify_connection = None
+        self.notify_lock = asyncio.Lock()
+        self.pending = set()
+
+    async def _connect(self):
+        import asyncpg
+        return await asyncpg.connect(self.dsn)
+
+    async def start(self):
+        self.task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.pending:
+            await asyncio.wait(self.pending, timeout=5)
+        if self.task is not None:
+            self.task.cancel()
+        if self.connection is not None:
+            await self.connection.close()
+        if self.notify_connection is not None:
+            await self.notify_connection.close()
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            try:
+                self.connection = await self._connect()
+                closed = asyncio.Event()
+                self.connection.add_termination_listener(lambda _: closed.set())
+                await self.connection.add_listener(CHANNEL, self._notified)
+                delay = 1
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Order events listener failed, reconnecting")
+            self.connection = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _notified(self, connection, pid, channel, payload):
+        self.broker.dispatch(json.loads(payload))
+
+    def publish(self, event: dict):
+        task = asyncio.create_task(self._notify(event))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _notify(self, event: dict):
+        async with self.notify_lock:
+            try:
+                if self.notify_connection is None or self.notify_connection.is_closed():
+                    self.notify_connection = await self._connect()
+                await self.notify_connection.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(event))
+            except Exception:
+                # Database unreachable: at least this worker's subscribers hear about it
+                logger.warning("Could not NOTIFY order event, delivering locally", exc_info=True)
+                if self.notify_connection is not None:
+                    self.notify_connection.terminate()
+                    self.notify_connection = None
+                self.broker.dispatch(event)
+
+def _make_backend(broker: Broker):
+    url = make_url(settings.database_url)
+    backend = settings.order_events_backend
+    if backend == "auto":
+        backend = "postgres" if url.get_backend_name() == "postgresql" else "local"
+    if backend == "postgres":
+        return PostgresBackend(broker, url.set(drivername="postgresql").render_as_string(hide_password=False))
+    return LocalBackend(broker)
+
+broker = Broker()
+
+def publish(event: dict):
+    broker.publish(event)
+
+def sse_message(event: dict) -> str:
+    return f"event: status\ndata: {json.dumps(event)}\n\n"
+
+async def sse_stream(subscription: Subscription, initial: dict = None):
+    """Current status first, then every transition, with keepalive comments;
+    a single order's stream ends once the order is completed or cancelled"""
+    try:
+        yield f"retry: {settings.order_events_retry_ms}\n\n"
+        if initial is not None:
+            yield sse_message(initial)
+            if subscription.key != _ALL and initial["status"] in FINAL_STATUSES:
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.order_events_keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield sse_message(event)
+            if subscription.key != _ALL and event["status"] in FINAL_STATUSES:
+                return
+    finally:
+        subscription.close()
+
+def stream_response(subscription: Subscription, initial: dict = None) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(subscription, initial),
+        media_type="text/event-stream",
+        # Proxies (nginx, Heroku's router) must not buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,110 @@
+"""Password hashing on a dedicated, bounded executor.
+
+bcrypt is deliberately slow and CPU-bound. Running it on the request threadpool
+lets a burst of logins occupy every worker and stall unrelated requests, so
+hashes run on their own small pool. At most workers + queue requests may be
+pending; beyond that new logins are rejected with 503 rather than queueing.
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from prometheus_client import Gauge, Histogram
+import asyncio
+import threading
+import time
+from .config import settings
+
+# Changing BCRYPT_ROUNDS makes needs_update() true for older hashes, which are
+# then upgraded transparently on the user's next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Password hash jobs waiting for a hashing worker", multiprocess_mode="livesum"
+)
+HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "Password hash jobs submitted and not yet finished", multiprocess_mode="livesum"
+)
+HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "bcrypt execution time", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+HASH_WAIT_SECONDS = Histogram(
+    "password_hash_wait_seconds", "Time a password hash job waited for a worker",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    """Return (valid, new_hash); new_hash is set when the stored hash needs upgrading"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _timed(fn, *args):
+    # Module level so it can be pickled for the process pool
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+class HashingExecutor:
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self):
+        # Created lazily so worker processes are forked after the server starts
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    def _track(self, delta: int):
+        with self._lock:
+            self._pending += delta
+            pending = self._pending
+        HASH_IN_FLIGHT.set(pending)
+        HASH_QUEUE_DEPTH.set(max(pending - self.workers, 0))
+
+    async def run(self, operation: str, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent sign-in attempts, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._track(1)
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        finally:
+            self._track(-1)
+        HASH_SECONDS.labels(operation).observe(elapsed)
+        HASH_WAIT_SECONDS.observe(max(time.perf_counter() - submitted - elapsed, 0.0))
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+hashing_executor = HashingExecutor(
+    settings.password_hash_executor, settings.password_hash_workers, settings.password_hash_max_queue
+)
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_executor.run("hash", get_password_hash, password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    return await hashing_executor.run("verify", verify_and_update, plain_password, hashed_password)
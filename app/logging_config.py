@@ -0,0 +1,166 @@
+"""Non-blocking logging pipeline.
+
+Every record is put on a bounded in-memory queue by a QueueHandler and written
+to stdout (and, if LOG_FILE is set, a rotating file) by a background
+QueueListener thread, so request handling never waits on disk or stdout. When
+the queue is full records are dropped (and counted) instead of blocking.
+
+The log file is for single-process runs only: gunicorn workers would each
+rotate the same file on their own and lose records. Under gunicorn, and on
+Heroku, log to stdout.
+"""
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from prometheus_client import Counter
+from datetime import datetime, timezone
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+
+ACCESS_LOGGER = "app.access"
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SuccessSampler(logging.Filter):
+    """Keep a fraction of access-log records for successful (< 400) responses"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or getattr(record, "status", 500) >= 400:
+            return True
+        return random.random() < self.rate
+
+# Event streams accept the bearer token in the query string (EventSource can't
+# send headers); it must never reach the logs
+_ACCESS_TOKEN = re.compile(r"((?:^|[?&])access_token=)[^&]*")
+
+def redact_query(query: str) -> str:
+    return _ACCESS_TOKEN.sub(r"\1[redacted]", query)
+
+class RedactAccessToken(logging.Filter):
+    """Redacts access_token in uvicorn's access log, whose args are
+    (client, method, path with query string, http version, status)"""
+
+    def filter(self, record):
+        if isinstance(record.args, tuple) and len(record.args) == 5 and isinstance(record.args[2], str):
+            record.args = record.args[:2] + (redact_query(record.args[2]),) + record.args[3:]
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records rather than blocking when the queue is full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record):
+        # Render the message and traceback here, but leave formatting to the
+        # listener's handlers so extra= fields survive for the JSON formatter.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+_listener = None
+_formatter_in_use = None
+
+def _formatter(settings):
+    if settings.log_format == "json":
+        return JSONFormatter()
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+def setup_logging(settings):
+    """Route all logging through a queue; safe to call more than once"""
+    global _listener, _formatter_in_use
+    if _listener is not None:
+        return _listener
+
+    formatter = _formatter_in_use = _formatter(settings)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings.log_file:
+        handlers.append(RotatingFileHandler(
+            settings.log_file,
+            maxBytes=settings.log_file_max_bytes,
+            backupCount=settings.log_file_backup_count,
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
+
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    for existing in list(access_logger.filters):
+        access_logger.removeFilter(existing)
+    access_logger.addFilter(SuccessSampler(settings.log_success_sample_rate))
+    server_access_logger = logging.getLogger("uvicorn.access")
+    for existing in list(server_access_logger.filters):
+        if isinstance(existing, RedactAccessToken):
+            server_access_logger.removeFilter(existing)
+    server_access_logger.addFilter(RedactAccessToken())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def restart_logging(settings):
+    """Start a new listener in a forked worker; the parent's thread isn't copied"""
+    global _listener
+    _listener = None
+    return setup_logging(settings)
+
+def shutdown_logging():
+    """Flush queued records, stop the listener thread and log straight to stdout"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        # Nothing drains the queue any more; records logged after this point
+        # (atexit hooks, late shutdown messages) would otherwise be dropped
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                root.removeHandler(handler)
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_formatter_in_use)
+        root.addHandler(handler)
@@ -1,29 +1,28 @@
 
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError, HTTPException
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from .database import init_db
-from .product_router import router as product_router
-from .auth_router import router as auth_router
-from .order_router import router as order_router
+from .database import init_db, engine, async_engine
+from .hashing import hashing_executor
 from .monitoring import router as monitoring_router
 from .middleware import setup_middleware
 from .config import settings
+from . import events
+from .logging_config import setup_logging, shutdown_logging
+from .responses import ORJSONResponse
 import logging
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+setup_logging(settings)
 
 app = FastAPI(
     title="Coffee Shop API",
     description="A production-ready coffee shop management API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Setup middleware
@@ -31,42 +30,61 @@ app = setup_middleware(app, settings)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
+    # errors() can carry the raised exception in "ctx", which isn't JSON serializable
+    return ORJSONResponse(
         status_code=422,
-        content={"detail": "Validation error", "errors": exc.errors()}
+        content={"detail": "Validation error", "errors": jsonable_encoder(exc.errors())}
     )
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
 @app.exception_handler(StarletteHTTPException)
 async def starlette_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
 @app.on_event("startup")
-def on_startup():
-    init_db()
+async def on_startup():
+    if settings.migrate_on_startup:
+        init_db()
+    await events.broker.start()
     logging.info("Coffee Shop API started successfully")
 
 @app.on_event("shutdown")
-def on_shutdown():
+async def on_shutdown():
+    await events.broker.stop()
+    hashing_executor.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
     logging.info("Coffee Shop API shutting down")
+    shutdown_logging()
+
+# Include routers; ASYNC_DATABASE selects the async handlers on an AsyncSession
+if settings.async_database:
+    from .async_product_router import router as product_router
+    from .async_auth_router import router as auth_router
+    from .async_order_router import router as order_router
+    from .async_admin_router import router as admin_router
+else:
+    from .product_router import router as product_router
+    from .auth_router import router as auth_router
+    from .order_router import router as order_router
+    from .admin_router import router as admin_router
 
-# Include routers
 app.include_router(monitoring_router, tags=["monitoring"])
 app.include_router(auth_router, tags=["authentication"])
 app.include_router(product_router, prefix="/api/v1", tags=["products"])
 app.include_router(order_router, prefix="/api/v1", tags=["orders"])
-
-# Import and include admin router
-from .admin_router import router as admin_router
 app.include_router(admin_router, prefix="/api/v1", tags=["admin"])
 
 @app.get("/")
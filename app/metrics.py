@@ -0,0 +1,203 @@
+"""Prometheus metrics.
+
+Set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory before the app is
+imported to aggregate metrics across worker processes; each worker then writes
+its samples to mmap files in that directory and /metrics merges them.
+"""
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+import os
+import time
+from . import querylog
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir"))
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"], multiprocess_mode="livesum"
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ["operation"])
+DB_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["operation"], buckets=_DB_BUCKETS
+)
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected by the rate limiter", ["route"])
+UPTIME = Gauge("app_uptime_seconds", "Seconds since this worker process started", multiprocess_mode="liveall")
+RESIDENT_MEMORY = Gauge(
+    "app_resident_memory_bytes", "Resident set size of this worker process", multiprocess_mode="liveall"
+)
+
+_STARTED = time.monotonic()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_process_state = {"sampled_at": 0.0}
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def sample_process(min_interval: float = 5.0):
+    """Refresh uptime/RSS gauges at most every min_interval seconds"""
+    now = time.monotonic()
+    if now - _process_state["sampled_at"] < min_interval:
+        return
+    _process_state["sampled_at"] = now
+    UPTIME.set(now - _STARTED)
+    RESIDENT_MEMORY.set(_resident_memory())
+
+def route_template(scope) -> str:
+    """Route path template (not the raw URL) to keep label cardinality bounded"""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(path):
+        # Newer FastAPI versions report an included route without its router prefix
+        for index, char in enumerate(path):
+            if char == "/" and index and regex.match(path[index:]):
+                return path[:index] + template
+    return template
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    status = str(status)
+    HTTP_REQUESTS.labels(method, route, status).inc()
+    HTTP_LATENCY.labels(method, route, status).observe(duration)
+    sample_process()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            observe_request(method, route_template(scope), status_code, time.perf_counter() - start)
+
+# The one timing listener pair per engine: it feeds both these metrics and
+# the per-request accounting in app.querylog
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append((context, time.perf_counter()))
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, started = conn.info["query_start"].pop()
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip()[:6].upper()
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        operation = "OTHER"
+    DB_QUERIES.labels(operation).inc()
+    DB_LATENCY.labels(operation).observe(elapsed)
+    querylog.record(statement, parameters, executemany, elapsed)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so the stack doesn't grow on a pooled connection and pair later
+    # statements with the wrong start. Errors raised before the statement
+    # reached the cursor pushed nothing.
+    conn = exception_context.connection
+    stack = conn.info.get("query_start") if conn is not None else None
+    if stack and stack[-1][0] is exception_context.execution_context:
+        stack.pop()
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+_caches = {}
+_pools = {}
+
+def register_cache(name: str, cache):
+    _caches[name] = cache
+
+def register_pool(name: str, sync_engine):
+    _pools[name] = sync_engine
+
+class _StateCollector(Collector):
+    """Cache and connection-pool state of the scraping process, read at scrape time"""
+
+    def describe(self):
+        # Names are dynamic; skip the registration-time collect()
+        return []
+
+    def collect(self):
+        pid = str(os.getpid())
+        cache_lookups = CounterMetricFamily("cache_lookups", "Cache lookups by result", labels=["cache", "result", "pid"])
+        cache_size = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache", "pid"])
+        for name, cache in _caches.items():
+            stats = cache.stats()
+            cache_lookups.add_metric([name, "hit", pid], stats["hits"])
+            cache_lookups.add_metric([name, "miss", pid], stats["misses"])
+            cache_size.add_metric([name, pid], stats["size"])
+        yield cache_lookups
+        yield cache_size
+
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections checked out of the pool", labels=["pool", "pid"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Overflow connections in use", labels=["pool", "pid"])
+        wait = CounterMetricFamily("db_pool_wait_seconds", "Time spent waiting for a pooled connection", labels=["pool", "pid"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Pool checkouts that timed out", labels=["pool", "pid"])
+        from .database import pool_status
+        for name, sync_engine in _pools.items():
+            status = pool_status(sync_engine)
+            if "checked_out" in status:
+                checked_out.add_metric([name, pid], status["checked_out"])
+                overflow.add_metric([name, pid], status["overflow"])
+            if "wait_seconds_total" in status:
+                wait.add_metric([name, pid], status["wait_seconds_total"])
+                timeouts.add_metric([name, pid], status["timeouts"])
+        yield checked_out
+        yield overflow
+        yield wait
+        yield timeouts
+
+_state_collector = _StateCollector()
+
+if MULTIPROCESS:
+    _registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(_registry)
+    _registry.register(_state_collector)
+else:
+    _registry = REGISTRY
+    _registry.register(_state_collector)
+
+def render() -> bytes:
+    sample_process(min_interval=0)
+    return generate_latest(_registry)
@@ -1,5 +1,5 @@
 from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -9,37 +9,108 @@ from starlette.middleware.sessions import SessionMiddleware
 import time
 import logging
 import uuid
+from .logging_config import ACCESS_LOGGER, redact_query
+from .config import settings
+from .metrics import MetricsMiddleware, RATE_LIMIT_REJECTIONS, route_template
+from . import profiler, querylog, ratelimit  # ratelimit registers the sqlite:// limiter storage
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+access_logger = logging.getLogger(ACCESS_LOGGER)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        return response
+def client_address(request: Request) -> str:
+    """The client's address as seen by the outermost trusted proxy.
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    Proxies append to X-Forwarded-For, so only the last TRUSTED_PROXY_HOPS
+    entries are theirs; anything to the left was sent by the client and can
+    be anything.
+    """
+    hops = settings.trusted_proxy_hops
+    if hops > 0:
+        forwarded = [
+            entry.strip() for header in request.headers.getlist("x-forwarded-for")
+            for entry in header.split(",") if entry.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return get_remote_address(request)
+
+# Rate limiter; counters live in storage shared by all workers, with a
+# per-process in-memory fallback while that storage is unavailable
+limiter = Limiter(
+    key_func=client_address,
+    storage_uri=settings.rate_limit_storage_uri,
+    strategy=settings.rate_limit_strategy,
+    in_memory_fallback_enabled=True,
+)
+
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+}
+
+class RequestContextMiddleware:
+    """Security headers, request id, timing, SQL accounting and access logging as one pure ASGI middleware.
+
+    Headers are injected into the http.response.start message, so the response
+    body is passed through untouched and streaming responses keep streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
         request_id = str(uuid.uuid4())
-        
-        # Log request
-        logging.info(f"Request {request_id}: {request.method} {request.url}")
-        
-        response = await call_next(request)
-        
-        # Log response
-        process_time = time.time() - start_time
-        logging.info(f"Response {request_id}: {response.status_code} - {process_time:.3f}s")
-        
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        return response
+        queries, queries_token = querylog.start_request(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = f"{process_time:.6f}"
+                # Statements issued after the headers (streamed bodies) aren't included
+                if settings.server_timing_header:
+                    headers.append("Server-Timing", querylog.server_timing(queries, process_time))
+                
+                # One structured access-log record per request; the queue
+                # handler hands it to a background thread for formatting and I/O
+                if access_logger.isEnabledFor(logging.INFO):
+                    access_logger.info(
+                        "%s %s %s %.1fms", scope["method"], scope["path"], message["status"], process_time * 1000,
+                        extra={
+                            "request_id": request_id,
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "query": redact_query(scope.get("query_string", b"").decode("latin-1")),
+                            "status": message["status"],
+                            "duration_ms": round(process_time * 1000, 3),
+                            "db_queries": queries.count,
+                            "db_ms": round(queries.seconds * 1000, 3),
+                        },
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            querylog.end_request(queries_token)
+            profile = profiler.current()
+            if profile is not None:
+                profile.request_finished(
+                    route_template(scope), getattr(scope.get("route"), "endpoint", None), start_time, time.perf_counter()
+                )
+
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    RATE_LIMIT_REJECTIONS.labels(route_template(request.scope)).inc()
+    return _rate_limit_exceeded_handler(request, exc)
 
 def setup_middleware(app, settings):
     # CORS
@@ -51,17 +122,17 @@ def setup_middleware(app, settings):
         allow_headers=settings.allowed_headers,
     )
     
-    # Security Headers
-    app.add_middleware(SecurityHeadersMiddleware)
-    
-    # Logging
-    app.add_middleware(LoggingMiddleware)
+    # Security headers, request id, timing and logging
+    app.add_middleware(RequestContextMiddleware)
     
     # Session middleware
     app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
     
+    # Metrics (outermost, so latency covers the whole stack)
+    app.add_middleware(MetricsMiddleware)
+    
     # Rate limiting
     app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
     
     return app
@@ -0,0 +1,288 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in schema_migrations. upgrade() runs every
+pending migration in order, each in its own transaction together with its
+version row, so a failed migration leaves the schema at the previous version.
+
+Migration 1 is the baseline: the tables as they stood before versioning.
+Every migration spells out the tables it creates instead of reading them off
+app.models, so its effect never changes with the models. Databases created
+before versioning got create_all() of the models of their day, which may
+already include later tables or indexes, so migrations still skip what exists
+(IF NOT EXISTS, checkfirst=True, rows that are already migrated).
+
+Add a migration by appending a function decorated with @migration(<next
+version>, "<description>"). Never renumber or edit an applied migration.
+"""
+from sqlalchemy import (
+    Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, JSON, MetaData, Table,
+    case, exists, func, select, insert, text,
+)
+from datetime import datetime
+import logging
+import re
+from .search import init_search_index
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} must be numbered after {MIGRATIONS[-1][0]}")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+# Tables as each migration found or left them, spelled out rather than taken
+# from app.models so a migration keeps meaning the same thing when the models
+# change. Each migration creates only its own tables from here.
+_schema = MetaData()
+
+_coffee_products = Table(
+    "coffee_products", _schema,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, index=True),
+    Column("image", String),
+    Column("original_ingredients", JSON),
+    Column("ingredients", JSON),
+    Column("category", String),
+    Column("description", String),
+    Column("prices", JSON),
+    Column("sizes", JSON),
+    Column("caffeine_mg", Integer),
+    Column("calories", Integer),
+    Column("is_featured", Boolean),
+    Column("is_available", Boolean),
+    Column("preparation_time", Integer),
+    Column("customizations", JSON),
+    Column("rating", Float),
+    Column("review_count", Integer),
+)
+
+_users = Table(
+    "users", _schema,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String, unique=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("hashed_password", String),
+    Column("is_active", Boolean),
+    Column("is_admin", Boolean),
+    Column("created_at", DateTime),
+)
+
+_orders = Table(
+    "orders", _schema,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("items", JSON),
+    Column("total_price", Float),
+    Column("status", String),
+    Column("created_at", DateTime),
+)
+
+_order_items = Table(
+    "order_items", _schema,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("order_id", Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("product_id", Integer, nullable=False, index=True),
+    Column("size", String),
+    Column("quantity", Integer),
+    Column("unit_price", Float),
+    Column("line_total", Float),
+    Column("customizations", JSON),
+)
+
+_stats_counters = Table(
+    "stats_counters", _schema,
+    Column("name", String, primary_key=True),
+    Column("value", Float, nullable=False),
+)
+
+_cache_versions = Table(
+    "cache_versions", _schema,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+@migration(1, "baseline schema")
+def create_tables(conn):
+    _schema.create_all(bind=conn, tables=[_coffee_products, _users, _orders])
+
+@migration(2, "full-text search index")
+def create_search_index(conn):
+    init_search_index(conn)
+
+# Size resolution as pricing.PriceTable did it when migration 3 was written:
+# sizes pair positionally with the offered price keys and are reachable by
+# label, first word, volume and price key
+_PRICE_KEYS = ["small", "medium", "large", "single", "double"]
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+_OUNCES = re.compile(r"(\d+)\s*oz")
+
+def _price_lookup(sizes, prices):
+    prices = prices or {}
+    offered = [key for key in _PRICE_KEYS if prices.get(key) is not None]
+    table = {key: (key, prices[key]) for key in offered}
+    for label, key in zip(sizes or [], offered):
+        entry = (label, prices[key])
+        table[key] = entry
+        table[_NON_ALNUM.sub("", label.lower())] = entry
+        words = label.split()
+        if words:
+            table.setdefault(_NON_ALNUM.sub("", words[0].lower()), entry)
+        ounces = _OUNCES.search(label.lower())
+        if ounces:
+            table.setdefault(f"{ounces.group(1)}oz", entry)
+    return table
+
+@migration(3, "backfill order_items from orders.items JSON")
+def backfill_order_items(conn, chunk_size: int = 500):
+    _order_items.create(bind=conn, checkfirst=True)
+    migrated = 0
+    last_id = 0
+    while True:
+        orders = conn.execute(
+            select(_orders.c.id, _orders.c["items"]).where(
+                _orders.c.id > last_id,
+                ~exists().where(_order_items.c.order_id == _orders.c.id),
+            ).order_by(_orders.c.id).limit(chunk_size)
+        ).all()
+        if not orders:
+            break
+        last_id = orders[-1].id
+
+        legacy = [(order_id, lines or []) for order_id, lines in orders]
+        product_ids = {line.get("product_id") for _, lines in legacy for line in lines} - {None}
+        tables = {
+            product_id: _price_lookup(sizes, prices)
+            for product_id, sizes, prices in conn.execute(
+                select(_coffee_products.c.id, _coffee_products.c.sizes, _coffee_products.c.prices)
+                .where(_coffee_products.c.id.in_(product_ids))
+            )
+        }
+        rows = []
+        for order_id, lines in legacy:
+            for line in lines:
+                if line.get("product_id") is None:
+                    continue
+                quantity = line.get("quantity") or 1
+                size, unit_price = line.get("size"), None
+                table = tables.get(line.get("product_id"))
+                if table is not None and size:
+                    # Prices at migration time; historical unit prices weren't stored
+                    size, unit_price = table.get(_NON_ALNUM.sub("", size.lower()), (size, None))
+                rows.append({
+                    "order_id": order_id,
+                    "product_id": line.get("product_id"),
+                    "size": size,
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "line_total": round(unit_price * quantity, 2) if unit_price is not None else None,
+                    "customizations": line.get("customizations") or [],
+                })
+        if rows:
+            conn.execute(insert(_order_items), rows)
+            migrated += len(rows)
+    if migrated:
+        logger.info(f"Backfilled {migrated} order lines into order_items")
+
+# Order statuses and counter names as of migration 4
+_ORDER_STATUSES = ["pending", "preparing", "ready", "completed", "cancelled"]
+
+@migration(4, "seed dashboard counters")
+def seed_stats_counters(conn):
+    _stats_counters.create(bind=conn, checkfirst=True)
+    values = conn.execute(select(
+        select(func.count()).select_from(_users).scalar_subquery().label("users"),
+        select(func.count()).select_from(_coffee_products).scalar_subquery().label("products"),
+        func.count(_orders.c.id).label("orders"),
+        func.coalesce(func.sum(
+            case((_orders.c.status != "cancelled", _orders.c.total_price), else_=0.0)
+        ), 0.0).label("revenue"),
+        *[
+            func.coalesce(func.sum(case((_orders.c.status == status, 1), else_=0)), 0).label(f"orders_{status}")
+            for status in _ORDER_STATUSES
+        ],
+    ).select_from(_orders)).one()._mapping
+    existing = set(conn.execute(select(_stats_counters.c.name)).scalars())
+    rows = [{"name": name, "value": value or 0} for name, value in values.items() if name not in existing]
+    if rows:
+        conn.execute(insert(_stats_counters), rows)
+
+@migration(5, "indexes for order history, admin listing, status filters and catalog filters")
+def create_query_indexes(conn):
+    # On their own stub tables: attached to _schema's tables, create_all in
+    # migration 1 would create them too
+    orders = Table("orders", MetaData(), Column("user_id", Integer), Column("created_at", DateTime), Column("status", String))
+    products = Table(
+        "coffee_products", MetaData(),
+        Column("category", String), Column("is_available", Boolean), Column("is_featured", Boolean),
+    )
+    for index in (
+        Index("ix_orders_user_id_created_at", orders.c.user_id, orders.c.created_at),
+        Index("ix_orders_created_at", orders.c.created_at),
+        Index("ix_orders_status", orders.c.status),
+        Index("ix_coffee_products_category_available_featured",
+              products.c.category, products.c.is_available, products.c.is_featured),
+    ):
+        index.create(bind=conn, checkfirst=True)
+
+def seed_cache_versions(conn, *names):
+    existing = set(conn.execute(select(_cache_versions.c.name)).scalars())
+    rows = [{"name": name, "version": 1, "updated_at": datetime.utcnow()} for name in names if name not in existing]
+    if rows:
+        conn.execute(insert(_cache_versions), rows)
+
+@migration(6, "shared catalog version")
+def create_cache_versions(conn):
+    _cache_versions.create(bind=conn, checkfirst=True)
+    seed_cache_versions(conn, "catalog")
+
+@migration(7, "shared auth version")
+def seed_auth_version(conn):
+    seed_cache_versions(conn, "auth")
+
+def applied_versions(conn):
+    _metadata.create_all(bind=conn)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def pending(engine):
+    """(version, description) of migrations not yet applied"""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    return [(version, description) for version, description, _ in MIGRATIONS if version not in applied]
+
+def upgrade(engine):
+    """Apply pending migrations in order; returns the versions applied"""
+    applied_now = []
+    for version, description, fn in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Serialize concurrent upgrades (e.g. release and a booting dyno)
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+            if version in applied_versions(conn):
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            fn(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+            applied_now.append(version)
+    return applied_now
+
+if __name__ == "__main__":
+    from .database import engine
+    logging.basicConfig(level=logging.INFO)
+    versions = upgrade(engine)
+    print(f"Applied migrations: {versions}" if versions else "Database schema is up to date")
@@ -1,12 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.types import JSON
 from datetime import datetime
 
 Base = declarative_base()
 
+ORDER_STATUSES = ["pending", "preparing", "ready", "completed", "cancelled"]
+
 class CoffeeProduct(Base):
     __tablename__ = "coffee_products"
+    __table_args__ = (
+        # Catalog filters: category, then availability and featured flags
+        Index("ix_coffee_products_category_available_featured", "category", "is_available", "is_featured"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     image = Column(String)
@@ -37,10 +43,47 @@ class User(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # A user's order history, newest first
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        # Admin order listing, newest first
+        Index("ix_orders_created_at", "created_at"),
+        # Status filters (dashboard, export)
+        Index("ix_orders_status", "status"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    items = Column(JSON)
+    # Pre-order_items JSON blob; only read by the backfill
+    legacy_items = Column("items", JSON)
     total_price = Column(Float)
     status = Column(String, default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("User")
+    # Not eager: queries that return order lines ask for them with selectinload
+    items = relationship("OrderItem", order_by="OrderItem.id", cascade="all, delete-orphan", back_populates="order")
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    # No foreign key: order history outlives deleted products
+    product_id = Column(Integer, nullable=False, index=True)
+    size = Column(String)
+    quantity = Column(Integer)
+    unit_price = Column(Float)
+    line_total = Column(Float)
+    customizations = Column(JSON)
+    order = relationship("Order", back_populates="items")
+
+class CacheVersion(Base):
+    """Version stamp of a per-process cache, bumped by its writes (see app.versions)"""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class StatsCounter(Base):
+    """Dashboard counter maintained by the write paths (see app.stats)"""
+    __tablename__ = "stats_counters"
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0)
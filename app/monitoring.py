@@ -1,20 +1,11 @@
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import text
 import logging
-import sys
+from . import metrics
 
 router = APIRouter()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 @router.get("/health")
 def health_check():
     """Health check endpoint"""
@@ -28,21 +19,16 @@ def health_check():
 def db_health_check():
     """Database health check"""
     try:
-        from .database import SessionLocal
+        from .database import SessionLocal, engine, pool_status
         db = SessionLocal()
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         db.close()
-        return {"status": "healthy", "database": "connected"}
+        return {"status": "healthy", "database": "connected", "pool": pool_status(engine)}
     except Exception as e:
         logging.error(f"Database health check failed: {e}")
         raise HTTPException(status_code=503, detail="Database unavailable")
 
 @router.get("/metrics")
 def get_metrics():
-    """Basic metrics endpoint"""
-    # In production, you might use Prometheus metrics here
-    return {
-        "uptime": "placeholder",
-        "requests_total": "placeholder",
-        "active_connections": "placeholder"
-    }
+    """Prometheus metrics in the text exposition format"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
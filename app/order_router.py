@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, database
-from .auth_router import get_user
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+from . import models, schemas, database, pricing, stats, events
+from .config import settings
+from .auth_router import get_current_user, get_stream_user
 from .middleware import limiter
-from datetime import datetime
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+from .pagination import paginate_newest_first
+from .responses import json_response
 
 router = APIRouter()
 
@@ -18,97 +19,134 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    from .auth_router import get_user
-    from jose import JWTError, jwt
-    from .config import settings
-    
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+def new_order(user_id: int, lines, total_price: float):
+    return models.Order(
+        user_id=user_id,
+        items=[models.OrderItem(**line) for line in lines],
+        total_price=total_price,
+        status="pending"
+    )
+
+def check_batch_size(batch: schemas.OrderBatchCreate):
+    if not batch.orders:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one order")
+    if len(batch.orders) > settings.order_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch may contain at most {settings.order_batch_max_size} orders"
+        )
+
+def batch_product_ids(batch: schemas.OrderBatchCreate):
+    return {item.product_id for order in batch.orders for item in order.items}
+
+def price_batch(batch: schemas.OrderBatchCreate, user_id: int, tables):
+    """Price every order of a batch against preloaded price tables.
+
+    Returns (rows, failures): rows are (index, order values, lines) ready for
+    a bulk insert, failures are results for orders that could not be priced.
+    """
+    rows, failures = [], []
+    for index, order in enumerate(batch.orders):
+        try:
+            lines, total_price = pricing.price_order(order.items, None, tables)
+        except HTTPException as exc:
+            failures.append({"index": index, "status_code": exc.status_code, "error": exc.detail})
+            continue
+        rows.append((index, {"user_id": user_id, "total_price": total_price, "status": "pending"}, lines))
+    return rows, failures
+
+_ORDER_COLUMNS = (models.Order.id, models.Order.user_id, models.Order.total_price, models.Order.status, models.Order.created_at)
+
+def bulk_insert_orders():
+    # Plain column rows rather than ORM objects, returned in parameter order so
+    # they line up with the batch indexes and don't expire on commit
+    return insert(models.Order).returning(*_ORDER_COLUMNS, sort_by_parameter_order=True)
+
+def batch_item_rows(rows, created):
+    """order_items rows for the orders created by bulk_insert_orders()"""
+    return [{**line, "order_id": order.id} for (_, _, lines), order in zip(rows, created) for line in lines]
+
+def batch_counters(rows):
+    return stats.order_created(sum(values["total_price"] for _, values, _ in rows), orders=len(rows))
+
+def check_order_visible(order, user: schemas.User):
+    if not order or (order.user_id != user.id and not user.is_admin):
+        raise HTTPException(status_code=404, detail="Order not found")
+
+def change_status(order_id: int, old: str, new: str):
+    """Set the status only if it is still old, so that of two concurrent
+    changes from the same status exactly one applies (and bumps the counters)"""
+    return update(models.Order).where(
+        models.Order.id == order_id, models.Order.status == old
+    ).values(status=new)
+
+def load_order(order_id: int):
+    # Own session: the stream outlives the request's dependencies
+    with database.SessionLocal() as db:
+        return db.get(models.Order, order_id)
+
+def batch_response(rows, created, failures):
+    results = failures + [
+        {"index": index, "status_code": 201, "order": {**order._mapping, "items": lines}}
+        for (index, _, lines), order in zip(rows, created)
+    ]
+    results.sort(key=lambda result: result["index"])
+    return json_response(
+        schemas.OrderBatchResponse,
+        {"created": len(created), "failed": len(failures), "results": results}
     )
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = get_user(db, username)
-    if user is None:
-        raise credentials_exception
-    return user
-
-def calculate_order_total(items: List[schemas.OrderItem], db: Session):
-    total = 0.0
-    for item in items:
-        product = db.query(models.CoffeeProduct).filter(models.CoffeeProduct.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        
-        # Get price based on size
-        size_key = item.size.lower().replace(" ", "_").replace("(", "").replace(")", "")
-        if "small" in size_key or "8oz" in size_key:
-            price = product.prices.get("small", 0)
-        elif "medium" in size_key or "12oz" in size_key:
-            price = product.prices.get("medium", 0)
-        elif "large" in size_key or "16oz" in size_key:
-            price = product.prices.get("large", 0)
-        elif "single" in size_key:
-            price = product.prices.get("single", 0)
-        elif "double" in size_key:
-            price = product.prices.get("double", 0)
-        else:
-            price = product.prices.get("small", 0)  # Default to small
-        
-        total += price * item.quantity
-    
-    return total
 
 @router.post("/orders", response_model=schemas.Order)
 @limiter.limit("10/minute")
-def create_order(request: Request, order: schemas.OrderCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Calculate total price
-    total_price = calculate_order_total(order.items, db)
+def create_order(request: Request, order: schemas.OrderCreate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Price each line and the total
+    lines, total_price = pricing.price_order(order.items, db)
     
-    # Create order
-    db_order = models.Order(
-        user_id=current_user.id,
-        items=[item.dict() for item in order.items],
-        total_price=total_price,
-        status="pending"
-    )
+    # Create order with its lines
+    db_order = new_order(current_user.id, lines, total_price)
     db.add(db_order)
+    stats.bump(db, stats.order_created(total_price))
     db.commit()
     db.refresh(db_order)
     
-    return schemas.Order(
-        id=db_order.id,
-        user_id=db_order.user_id,
-        items=order.items,
-        total_price=db_order.total_price,
-        status=db_order.status,
-        created_at=db_order.created_at.isoformat()
-    )
+    return json_response(schemas.Order, db_order)
 
-@router.get("/orders", response_model=List[schemas.Order])
-def get_user_orders(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    orders = db.query(models.Order).filter(models.Order.user_id == current_user.id).all()
-    return [
-        schemas.Order(
-            id=order.id,
-            user_id=order.user_id,
-            items=[schemas.OrderItem(**item) for item in order.items],
-            total_price=order.total_price,
-            status=order.status,
-            created_at=order.created_at.isoformat()
-        ) for order in orders
-    ]
+@router.post("/orders/batch", response_model=schemas.OrderBatchResponse)
+@limiter.limit("10/minute")
+def create_order_batch(request: Request, batch: schemas.OrderBatchCreate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    check_batch_size(batch)
+    
+    # One product fetch prices the whole batch
+    tables = pricing.get_price_tables(db, batch_product_ids(batch))
+    rows, failures = price_batch(batch, current_user.id, tables)
+    
+    # Every priceable order is inserted in one statement, its lines in a second,
+    # in a single transaction
+    created = []
+    if rows:
+        created = db.execute(bulk_insert_orders(), [values for _, values, _ in rows]).all()
+        item_rows = batch_item_rows(rows, created)
+        if item_rows:
+            db.execute(insert(models.OrderItem), item_rows)
+        stats.bump(db, batch_counters(rows))
+        db.commit()
+    
+    return batch_response(rows, created, failures)
+
+@router.get("/orders", response_model=schemas.OrderPage)
+def get_user_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Order).options(selectinload(models.Order.items)).filter(models.Order.user_id == current_user.id)
+    orders, next_cursor = paginate_newest_first(query, models.Order.created_at, models.Order.id, cursor, limit)
+    return json_response(schemas.OrderPage, {"items": orders, "next_cursor": next_cursor})
 
 @router.get("/orders/{order_id}", response_model=schemas.Order)
-def get_order(order_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(
+def get_order(order_id: int, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    order = db.query(models.Order).options(selectinload(models.Order.items)).filter(
         models.Order.id == order_id,
         models.Order.user_id == current_user.id
     ).first()
@@ -116,17 +154,23 @@ def get_order(order_id: int, current_user: models.User = Depends(get_current_use
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    return schemas.Order(
-        id=order.id,
-        user_id=order.user_id,
-        items=[schemas.OrderItem(**item) for item in order.items],
-        total_price=order.total_price,
-        status=order.status,
-        created_at=order.created_at.isoformat()
-    )
+    return json_response(schemas.Order, order)
+
+@router.get("/orders/{order_id}/events")
+async def order_events(order_id: int, current_user: schemas.User = Depends(get_stream_user)):
+    # Server-Sent Events: the current status, then each change until completed
+    # or cancelled. Subscribed before the read so no change falls in between.
+    subscription = events.broker.subscribe(order_id)
+    try:
+        order = await run_in_threadpool(load_order, order_id)
+        check_order_visible(order, current_user)
+    except BaseException:
+        subscription.close()
+        raise
+    return events.stream_response(subscription, events.order_event(order))
 
 @router.patch("/orders/{order_id}/status")
-def update_order_status(order_id: int, status: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_order_status(order_id: int, status: str, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
@@ -134,11 +178,20 @@ def update_order_status(order_id: int, status: str, current_user: models.User =
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    valid_statuses = ["pending", "preparing", "ready", "completed", "cancelled"]
+    valid_statuses = models.ORDER_STATUSES
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    order.status = status
+    # Another change committed since the read: re-read and apply on top of it
+    previous_status = order.status
+    while db.execute(change_status(order_id, previous_status, status)).rowcount != 1:
+        order = db.get(models.Order, order_id, populate_existing=True)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        previous_status = order.status
+    stats.bump(db, stats.status_changed(previous_status, status, order.total_price))
+    event = events.order_event(order, previous_status)
     db.commit()
+    events.publish(event)
     
     return {"message": f"Order {order_id} status updated to {status}"}
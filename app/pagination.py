@@ -0,0 +1,74 @@
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from datetime import datetime
+import base64
+import json
+
+# The keyset helpers accept either a legacy Query or a select() statement, so
+# the sync and async routers share them; only fetching the rows differs.
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque token"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _is_id(value) -> bool:
+    # bool is an int subclass; a cursor holding true/false is forged
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def after_id(query, id_column, cursor: str = None, limit: int = 50):
+    """Ascending keyset on an integer primary key, fetching one extra row"""
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not _is_id(last_id):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(id_column > last_id)
+    return query.order_by(id_column).limit(limit + 1)
+
+def id_page(rows, id_column, limit: int):
+    """Trim rows fetched by after_id; returns (rows, next_cursor)"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(getattr(rows[-1], id_column.key))
+    return rows, None
+
+def before_created(query, created_column, id_column, cursor: str = None, limit: int = 50):
+    """Descending keyset on (created_at, id), fetching one extra row"""
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, 2)
+        try:
+            last_created = datetime.fromisoformat(last_created)
+            if not _is_id(last_id):
+                raise ValueError(cursor)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(created_column, id_column) < tuple_(last_created, last_id))
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+def created_page(rows, created_column, id_column, limit: int):
+    """Trim rows fetched by before_created; returns (rows, next_cursor)"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+    return rows, None
+
+def paginate_by_id(query, id_column, cursor: str = None, limit: int = 50):
+    """Ascending keyset page on an integer primary key; returns (rows, next_cursor)"""
+    rows = after_id(query, id_column, cursor, limit).all()
+    return id_page(rows, id_column, limit)
+
+def paginate_newest_first(query, created_column, id_column, cursor: str = None, limit: int = 50):
+    """Descending keyset page on (created_at, id); returns (rows, next_cursor)"""
+    rows = before_created(query, created_column, id_column, cursor, limit).all()
+    return created_page(rows, created_column, id_column, limit)
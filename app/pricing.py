@@ -0,0 +1,124 @@
+from fastapi import HTTPException
+from typing import Dict, List
+import re
+from . import models, schemas, metrics, versions
+from .cache import TTLCache
+from .config import settings
+
+# Price keys in the order products list their sizes (small → large, single → double)
+PRICE_KEYS = list(schemas.PriceModel.model_fields)
+
+# Per-process cache of compiled price tables; cleared with the catalog cache.
+# A stale price would be stored in the order's totals, so get_price_tables
+# checks the shared catalog version on every call rather than once a second.
+price_table_cache = versions.catalog.track(TTLCache(maxsize=settings.catalog_cache_size, ttl=settings.catalog_cache_ttl))
+metrics.register_cache("price_table", price_table_cache)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+_OUNCES = re.compile(r"(\d+)\s*oz")
+
+def normalize_size(size: str) -> str:
+    return _NON_ALNUM.sub("", size.lower())
+
+class PriceTable:
+    """Size label → unit price lookup compiled once per product.
+
+    Sizes are paired positionally with the product's price keys, so a frappuccino
+    sold as Tall/Grande/Venti resolves to its small/medium/large prices. Each size
+    is reachable by its full label ("Venti (20oz)"), its first word ("venti"), its
+    volume ("20oz") and the underlying price key ("large"), and resolves to the
+    product's own label so order lines for the same size group together.
+    """
+
+    def __init__(self, product_id: int, sizes: List[str], prices: Dict[str, float]):
+        self.product_id = product_id
+        self.sizes = list(sizes or [])
+        prices = prices or {}
+        offered = [key for key in PRICE_KEYS if prices.get(key) is not None]
+        table = {key: (key, prices[key]) for key in offered}
+        for label, key in zip(self.sizes, offered):
+            entry = (label, prices[key])
+            table[key] = entry
+            table[normalize_size(label)] = entry
+            words = label.split()
+            if words:
+                table.setdefault(normalize_size(words[0]), entry)
+            ounces = _OUNCES.search(label.lower())
+            if ounces:
+                table.setdefault(f"{ounces.group(1)}oz", entry)
+        self._table = table
+
+    def resolve(self, size: str):
+        """Return (size label, unit price) for a requested size"""
+        entry = self._table.get(normalize_size(size))
+        if entry is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Size '{size}' is not available for product {self.product_id}. Choose one of: {self.sizes}"
+            )
+        return entry
+
+    def price_for(self, size: str) -> float:
+        return self.resolve(size)[1]
+
+def get_price_tables(db, product_ids, check_version: bool = True) -> Dict[int, PriceTable]:
+    """Return price tables for product_ids, loading any uncached ones in a single IN query.
+
+    check_version reads the catalog version first, dropping tables cached
+    before a product write made by any worker.
+    """
+    if check_version:
+        versions.catalog.refresh(db)
+    tables = {}
+    missing = set()
+    for product_id in set(product_ids):
+        table = price_table_cache.get(product_id)
+        if table is None:
+            missing.add(product_id)
+        else:
+            tables[product_id] = table
+    if missing:
+        rows = db.query(models.CoffeeProduct.id, models.CoffeeProduct.sizes, models.CoffeeProduct.prices).filter(
+            models.CoffeeProduct.id.in_(missing)
+        ).all()
+        for product_id, sizes, prices in rows:
+            table = PriceTable(product_id, sizes, prices)
+            price_table_cache.set(product_id, table)
+            tables[product_id] = table
+    return tables
+
+def resolve_items(items: List[schemas.OrderItem], db, tables: Dict[int, PriceTable] = None):
+    """Return (size label, unit price) for each order line, in order"""
+    if tables is None:
+        tables = get_price_tables(db, [item.product_id for item in items])
+    resolved = []
+    for item in items:
+        table = tables.get(item.product_id)
+        if table is None:
+            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+        resolved.append(table.resolve(item.size))
+    return resolved
+
+def price_items(items: List[schemas.OrderItem], db, tables: Dict[int, PriceTable] = None) -> List[float]:
+    """Return the unit price of each order line, in order"""
+    return [price for _, price in resolve_items(items, db, tables)]
+
+def order_total(items: List[schemas.OrderItem], unit_prices: List[float]) -> float:
+    return round(sum(price * item.quantity for item, price in zip(items, unit_prices)), 2)
+
+def price_order(items: List[schemas.OrderItem], db, tables: Dict[int, PriceTable] = None):
+    """Return (order lines, total) for the requested items.
+
+    Lines are dicts with the columns of models.OrderItem, minus order_id.
+    """
+    lines = []
+    for item, (label, price) in zip(items, resolve_items(items, db, tables)):
+        lines.append({
+            "product_id": item.product_id,
+            "size": label,
+            "quantity": item.quantity,
+            "unit_price": price,
+            "line_total": round(price * item.quantity, 2),
+            "customizations": item.customizations or [],
+        })
+    return lines, round(sum(line["unit_price"] * line["quantity"] for line in lines), 2)
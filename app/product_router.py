@@ -1,11 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from . import schemas, models, database
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from . import schemas, models, database, search, metrics, stats, versions
+from .cache import TTLCache
+from .config import settings
 from .middleware import limiter
+from .pagination import paginate_by_id
+from .responses import dump_json, json_response
 
 router = APIRouter()
 
+# Per-process catalog cache of rendered JSON bodies. Product writes bump the
+# shared catalog version, which is also the ETag validator, so every worker
+# hands out the same validators and clears this cache once it sees the version
+# move (within CATALOG_VERSION_CHECK_INTERVAL seconds).
+catalog_cache = versions.catalog.track(TTLCache(maxsize=settings.catalog_cache_size, ttl=settings.catalog_cache_ttl))
+metrics.register_cache("catalog", catalog_cache)
+
+def invalidate_catalog():
+    """After committing a product write that bumped versions.catalog"""
+    versions.catalog.invalidate()
+
+def _catalog_headers(version, last_modified):
+    return {
+        "ETag": f'"catalog-{version}"',
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+def _is_not_modified(request: Request, etag: str, last_modified: datetime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def catalog_result(request: Request, version, last_modified, body: bytes):
+    """A 304 when the client's validators are still current, otherwise the body.
+
+    Only called with the body in hand, so a resource that doesn't exist is
+    never reported as not modified.
+    """
+    headers = _catalog_headers(version, last_modified)
+    if _is_not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def store_catalog_body(key, version, body: bytes):
+    # Don't cache a body read while a product write was invalidating
+    if version == versions.catalog.version:
+        catalog_cache.set(key, body)
+
+def _catalog_response(request: Request, db: Session, key, render):
+    """Serve a catalog read from the cache, honouring conditional GETs.
+
+    render() returns the JSON body as bytes and is only called on a cache miss.
+    """
+    version, last_modified = versions.catalog.current(db)
+    body = catalog_cache.get(key)
+    if body is None:
+        body = render()
+        store_catalog_body(key, version, body)
+    return catalog_result(request, version, last_modified, body)
+
 def get_db():
     db = database.SessionLocal()
     try:
@@ -13,62 +78,72 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/products", response_model=List[schemas.CoffeeProduct])
+@router.get("/products", response_model=schemas.ProductPage)
 @limiter.limit("100/minute")
 def list_products(
     request: Request,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(100, ge=1, le=100),
     category: Optional[str] = None,
     featured: Optional[bool] = None,
     available: Optional[bool] = True,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.CoffeeProduct)
+    def render():
+        query = db.query(models.CoffeeProduct)
+        
+        if category:
+            query = query.filter(models.CoffeeProduct.category == category)
+        if featured is not None:
+            query = query.filter(models.CoffeeProduct.is_featured == featured)
+        if available is not None:
+            query = query.filter(models.CoffeeProduct.is_available == available)
+        
+        products, next_cursor = paginate_by_id(query, models.CoffeeProduct.id, cursor, limit)
+        return dump_json(schemas.ProductPage, {"items": products, "next_cursor": next_cursor})
     
-    if category:
-        query = query.filter(models.CoffeeProduct.category == category)
-    if featured is not None:
-        query = query.filter(models.CoffeeProduct.is_featured == featured)
-    if available is not None:
-        query = query.filter(models.CoffeeProduct.is_available == available)
-    
-    products = query.offset(skip).limit(limit).all()
-    return products
+    return _catalog_response(request, db, ("products", cursor, limit, category, featured, available), render)
 
-@router.get("/products/categories")
-def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(models.CoffeeProduct.category).distinct().all()
-    return {"categories": [cat[0] for cat in categories]}
+@router.get("/products/categories", response_model=schemas.CategoryList)
+def get_categories(request: Request, db: Session = Depends(get_db)):
+    def render():
+        categories = db.query(models.CoffeeProduct.category).distinct().all()
+        return schemas.CategoryList(categories=[cat[0] for cat in categories]).model_dump_json().encode()
+    
+    return _catalog_response(request, db, ("categories",), render)
 
-@router.get("/products/search")
+@router.get("/products/search", response_model=List[schemas.CoffeeProduct])
 @limiter.limit("50/minute")
 def search_products(
     request: Request,
     q: str = Query(..., min_length=2),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    products = db.query(models.CoffeeProduct).filter(
-        models.CoffeeProduct.name.contains(q) |
-        models.CoffeeProduct.description.contains(q)
-    ).all()
-    return products
+    return json_response(List[schemas.CoffeeProduct], search.search_products(db, q, skip=skip, limit=limit))
 
 @router.get("/products/{product_id}", response_model=schemas.CoffeeProduct)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.CoffeeProduct).filter(models.CoffeeProduct.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+def get_product(request: Request, product_id: int, db: Session = Depends(get_db)):
+    def render():
+        product = db.query(models.CoffeeProduct).filter(models.CoffeeProduct.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return dump_json(schemas.CoffeeProduct, product)
+    
+    return _catalog_response(request, db, ("product", product_id), render)
 
 @router.post("/products", response_model=schemas.CoffeeProduct)
 def create_product(product: schemas.CoffeeProductCreate, db: Session = Depends(get_db)):
     # In production, this should require admin authentication
     db_product = models.CoffeeProduct(**product.dict())
     db.add(db_product)
+    stats.bump(db, {"products": 1})
+    versions.catalog.bump(db)
     db.commit()
     db.refresh(db_product)
-    return db_product
+    invalidate_catalog()
+    return json_response(schemas.CoffeeProduct, db_product)
 
 @router.put("/products/{product_id}", response_model=schemas.CoffeeProduct)
 def update_product(product_id: int, product: schemas.CoffeeProductCreate, db: Session = Depends(get_db)):
@@ -78,9 +153,11 @@ def update_product(product_id: int, product: schemas.CoffeeProductCreate, db: Se
         raise HTTPException(status_code=404, detail="Product not found")
     for key, value in product.dict().items():
         setattr(db_product, key, value)
+    versions.catalog.bump(db)
     db.commit()
     db.refresh(db_product)
-    return db_product
+    invalidate_catalog()
+    return json_response(schemas.CoffeeProduct, db_product)
 
 @router.delete("/products/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(get_db)):
@@ -89,5 +166,8 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     db.delete(db_product)
+    stats.bump(db, {"products": -1})
+    versions.catalog.bump(db)
     db.commit()
+    invalidate_catalog()
     return {"detail": "Product deleted"}
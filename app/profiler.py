@@ -0,0 +1,223 @@
+"""On-demand statistical profiler for a running worker.
+
+A background thread samples the Python stack of every thread in the process
+with sys._current_frames() at a fixed interval, so requests run unmodified and
+the overhead is one stack walk per thread per tick. Idle threads (waiting on a
+lock, queue or selector) are counted separately and left out of the stacks.
+
+Samples are attributed to a route when the stack contains the route's
+endpoint function: RequestContextMiddleware reports each request's endpoint
+and route template to the running profile. Time spent in dependencies and
+middleware is therefore in the collapsed stacks but not in the per-route
+tables. Under ASYNC_DATABASE the driver does its work off the handler's
+stack (aiosqlite's thread, asyncpg's C code), so per-route tables show the
+handlers' Python work and the collapsed stacks show the driver.
+
+In slow mode (slow_ms) only samples of requests that took at least slow_ms are
+kept: samples showing a slow request's endpoint, taken while that request was
+in flight. Concurrent fast requests to the same route can be mixed in.
+
+Only the worker process serving the profile request is sampled.
+"""
+from collections import Counter, defaultdict
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+
+# Leaf frames of threads that are parked rather than running code
+_IDLE_LEAVES = {
+    ("threading", "wait"), ("threading", "_wait_for_tstate_lock"), ("queue", "get"),
+    ("selectors", "select"), ("socket", "accept"), ("concurrent.futures.thread", "_worker"),
+    ("logging.handlers", "dequeue"), ("time", "sleep"),
+    # uvloop runs the event loop in C, so a waiting loop shows this as its leaf
+    ("asyncio.runners", "run"),
+    ("aiosqlite.core", "_connection_worker_thread"),
+}
+
+_STDLIB = os.path.dirname(os.__file__)
+_current = None
+_lock = threading.Lock()
+
+class ProfilerBusy(Exception):
+    pass
+
+def current():
+    """The running profile, if any"""
+    return _current
+
+def _module_name(code) -> str:
+    path = code.co_filename
+    if "site-packages" in path:
+        path = path.split("site-packages", 1)[1].lstrip(os.sep)
+    elif path.startswith(_STDLIB):
+        path = path[len(_STDLIB) + 1:]
+    else:
+        path = os.path.relpath(path) if os.path.isabs(path) else path
+    return path[:-3].replace(os.sep, ".") if path.endswith(".py") else path
+
+class Profile:
+    def __init__(self, interval: float, slow_ms: float = None):
+        self.interval = interval
+        self.slow_ms = slow_ms
+        self.stacks = Counter()     # stack (root → leaf code objects) → samples
+        self.timeline = []          # (time, stack), slow mode only
+        self.endpoints = {}         # endpoint code → route template
+        self.slow_requests = []     # (route, endpoint code, start, end)
+        self.samples = 0
+        self.idle_samples = 0
+        self.ticks = 0
+        # Per profile, so code objects and their names are released with it
+        self._modules = {}
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _module(self, code) -> str:
+        module = self._modules.get(code)
+        if module is None:
+            module = self._modules[code] = _module_name(code)
+        return module
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{self._module(code)}:{getattr(code, 'co_qualname', code.co_name)}"
+        return label
+
+    def _is_idle(self, code) -> bool:
+        return (self._module(code), code.co_name) in _IDLE_LEAVES
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own)
+
+    def sample(self, own: int):
+        now = time.perf_counter()
+        self.ticks += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if self._is_idle(frame.f_code):
+                self.idle_samples += 1
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.samples += 1
+            if self.slow_ms is None:
+                self.stacks[stack] += 1
+            else:
+                self.timeline.append((now, stack))
+
+    def request_finished(self, route: str, endpoint, start: float, end: float):
+        """Called by the middleware for every request served while profiling"""
+        code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint is not None else None
+        if code is None:
+            return
+        self.endpoints[code] = route
+        if self.slow_ms is not None and (end - start) * 1000 >= self.slow_ms:
+            self.slow_requests.append((route, code, start, end))
+
+    def _kept_stacks(self) -> Counter:
+        if self.slow_ms is None:
+            return self.stacks
+        kept = Counter()
+        # Each sample counts once even when slow requests overlap
+        for at, stack in self.timeline:
+            for _, code, start, end in self.slow_requests:
+                if start <= at <= end and code in stack:
+                    kept[stack] += 1
+                    break
+        return kept
+
+    def _route(self, stack):
+        for code in reversed(stack):
+            route = self.endpoints.get(code)
+            if route is not None:
+                return route
+        return None
+
+    def report(self, top: int = 15) -> dict:
+        stacks = self._kept_stacks()
+        by_route = defaultdict(lambda: {"samples": 0, "self": Counter(), "total": Counter()})
+        for stack, count in stacks.items():
+            route = self._route(stack)
+            if route is None:
+                continue
+            entry = by_route[route]
+            entry["samples"] += count
+            entry["self"][self._label(stack[-1])] += count
+            for label in {self._label(code) for code in stack}:
+                entry["total"][label] += count
+
+        def top_functions(counter: Counter, samples: int):
+            return [
+                {"function": label, "samples": count, "percent": round(count / samples * 100, 1)}
+                for label, count in counter.most_common(top)
+            ]
+
+        routes = {
+            route: {
+                "samples": entry["samples"],
+                "top_self": top_functions(entry["self"], entry["samples"]),
+                "top_total": top_functions(entry["total"], entry["samples"]),
+            }
+            for route, entry in sorted(by_route.items(), key=lambda item: -item[1]["samples"])
+        }
+        result = {
+            "mode": "all" if self.slow_ms is None else "slow",
+            "pid": os.getpid(),
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "ticks": self.ticks,
+            "samples": sum(stacks.values()),
+            "idle_samples": self.idle_samples,
+            "routes": routes,
+            "collapsed": self.collapsed(stacks),
+        }
+        if self.slow_ms is not None:
+            result["slow_ms"] = self.slow_ms
+            result["slow_requests"] = [
+                {"route": route, "duration_ms": round((end - start) * 1000, 3)}
+                for route, _, start, end in self.slow_requests
+            ]
+        return result
+
+    def collapsed(self, stacks: Counter) -> str:
+        """Brendan Gregg's collapsed format: "root;...;leaf count" per line"""
+        lines = Counter()
+        for stack, count in stacks.items():
+            lines[";".join(self._label(code) for code in stack)] += count
+        return "\n".join(f"{line} {count}" for line, count in lines.most_common())
+
+async def profile(seconds: float, interval: float, slow_ms: float = None) -> Profile:
+    """Sample this process for seconds; one profile at a time per process"""
+    global _current
+    with _lock:
+        if _current is not None:
+            raise ProfilerBusy()
+        _current = Profile(interval, slow_ms)
+    profile = _current
+    try:
+        profile.start()
+        await asyncio.sleep(seconds)
+    finally:
+        # Joining the sampler waits up to one interval; not on the event loop
+        await asyncio.to_thread(profile.stop)
+        _current = None
+    return profile
@@ -0,0 +1,104 @@
+"""Per-request SQL accounting and the slow-query log.
+
+RequestContextMiddleware opens a RequestQueries for every request in a context
+variable; the engine listeners in app.metrics pass each statement's duration
+to record(), which adds it to the current request's totals. Sync
+handlers run in the threadpool with a copy of the request's context and async
+ones on greenlets that share it, so both stacks are counted. The totals go out
+in the Server-Timing header and the access log.
+
+Statements slower than SLOW_QUERY_MS are logged on the "app.sql.slow" logger
+with their duration and the shape of their parameters (names and types, never
+values).
+
+assert_query_budget() counts the statements a block of code issues, for tests:
+
+    with assert_query_budget(3):
+        client.get("/api/v1/orders", headers=auth)
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import threading
+from .config import settings
+
+SLOW_QUERY_LOGGER = "app.sql.slow"
+
+slow_query_logger = logging.getLogger(SLOW_QUERY_LOGGER)
+
+class RequestQueries:
+    __slots__ = ("request_id", "count", "seconds")
+
+    def __init__(self, request_id: str = None):
+        self.request_id = request_id
+        self.count = 0
+        self.seconds = 0.0
+
+_current: ContextVar = ContextVar("request_queries", default=None)
+
+def start_request(request_id: str = None):
+    """Begin counting for the current request; returns (counter, token for end_request)"""
+    queries = RequestQueries(request_id)
+    return queries, _current.set(queries)
+
+def end_request(token):
+    _current.reset(token)
+
+def current_request():
+    return _current.get()
+
+def parameters_shape(parameters, executemany: bool):
+    """Parameter names and types without their values"""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "each": parameters_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+def record(statement: str, parameters, executemany: bool, elapsed: float):
+    """Account for a statement that took elapsed seconds"""
+    queries = _current.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += elapsed
+    for listener in _budget_listeners:
+        listener(statement)
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        slow_query_logger.warning(
+            "Slow query: %.1fms", elapsed * 1000,
+            extra={
+                "request_id": queries.request_id if queries is not None else None,
+                "duration_ms": round(elapsed * 1000, 3),
+                "statement": statement[:2000],
+                "parameters": parameters_shape(parameters, executemany),
+            },
+        )
+
+def server_timing(queries: RequestQueries, total_seconds: float) -> str:
+    return f'db;dur={queries.seconds * 1000:.3f};desc="{queries.count} queries", total;dur={total_seconds * 1000:.3f}'
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+_budget_listeners = []
+_budget_lock = threading.Lock()
+
+@contextmanager
+def assert_query_budget(max_queries: int):
+    """Fail when the block issues more than max_queries statements on any
+    instrumented engine, listing them so an N+1 pattern is easy to spot"""
+    statements = []
+    listener = statements.append
+    with _budget_lock:
+        _budget_listeners.append(listener)
+    try:
+        yield statements
+    finally:
+        with _budget_lock:
+            _budget_listeners.remove(listener)
+    if len(statements) > max_queries:
+        listing = "\n".join(f"  {i}. {' '.join(statement.split())[:200]}" for i, statement in enumerate(statements, 1))
+        raise QueryBudgetExceeded(f"{len(statements)} queries issued, budget is {max_queries}:\n{listing}")
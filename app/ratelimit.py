@@ -0,0 +1,160 @@
+"""Rate-limit storage shared by every worker process on the host.
+
+The default in-memory storage of the limits library is per process, so with N
+workers each client effectively gets N times the configured limit, and its
+counters are never evicted. SQLiteStorage keeps the counters in one SQLite
+file that all workers open. Each check is a single short transaction on a
+per-thread connection. Expired windows are purged periodically, and the table
+is capped at max_keys rows, so idle clients don't accumulate.
+
+Importing this module registers the "sqlite://" scheme with limits; set
+RATE_LIMIT_STORAGE_URI to a redis:// URI to use limits' Redis storage instead
+(requires the redis package).
+"""
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Start a fresh window when the stored one has expired, otherwise add to it
+_INCR = """
+INSERT INTO rate_limits (key, count, expires_at) VALUES (:key, :amount, :now + :expiry)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN expires_at <= :now THEN excluded.count ELSE count + excluded.count END,
+    expires_at = CASE WHEN expires_at <= :now THEN excluded.expires_at ELSE expires_at END
+RETURNING count
+"""
+
+_GET = "SELECT count, expires_at FROM rate_limits WHERE key = ? AND expires_at > ?"
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """limits storage backed by a SQLite file, supporting the fixed-window and
+    sliding-window-counter strategies.
+
+    URI: sqlite:///relative/path.db or sqlite:////absolute/path.db
+    Options: max_keys (row cap), cleanup_interval (seconds between purges of
+    expired windows), busy_timeout_ms.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, max_keys=100_000,
+                 cleanup_interval=30, busy_timeout_ms=1000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len("sqlite:///"):] if uri.startswith("sqlite:///") else uri.split("://", 1)[-1]
+        self.max_keys = int(max_keys)
+        self.cleanup_interval = float(cleanup_interval)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        with self._connection() as conn:
+            conn.execute(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        local = self._local
+        # A connection must not cross a fork (e.g. gunicorn preload_app)
+        if getattr(local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            # Counters are disposable; don't fsync on every hit
+            conn.execute("PRAGMA synchronous = OFF")
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def _maybe_cleanup(self, conn, now: float):
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self.cleanup_interval
+        conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        excess = conn.execute("SELECT count(*) FROM rate_limits").fetchone()[0] - self.max_keys
+        if excess > 0:
+            # Drop the windows closest to expiring first
+            conn.execute(
+                "DELETE FROM rate_limits WHERE key IN "
+                "(SELECT key FROM rate_limits ORDER BY expires_at LIMIT ?)", (excess,)
+            )
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        conn = self._connection()
+        now = time.time()
+        self._maybe_cleanup(conn, now)
+        return conn.execute(_INCR, {"key": key, "amount": amount, "now": now, "expiry": expiry}).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(_GET, (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(_GET, (key, now)).fetchone()
+        return row[1] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+    def _window_counts(self, conn, key: str, expiry: int, now: float):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous = conn.execute(_GET, (previous_key, now)).fetchone()
+        current = conn.execute(_GET, (current_key, now)).fetchone()
+        previous_count = previous[0] if previous else 0
+        current_count = current[0] if current else 0
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return current_key, previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        conn = self._connection()
+        now = time.time()
+        self._maybe_cleanup(conn, now)
+        # IMMEDIATE takes the write lock up front, so the check and the
+        # increment are atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current_key, previous_count, previous_ttl, current_count, _ = self._window_counts(conn, key, expiry, now)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            allowed = int(weighted) + amount <= limit
+            if allowed:
+                conn.execute(_INCR, {"key": current_key, "amount": amount, "now": now, "expiry": 2 * expiry}).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def get_sliding_window(self, key: str, expiry: int):
+        _, previous_count, previous_ttl, current_count, current_ttl = self._window_counts(
+            self._connection(), key, expiry, time.time()
+        )
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
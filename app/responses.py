@@ -0,0 +1,28 @@
+"""Fast JSON responses.
+
+ORJSONResponse is the app's default response class. Handlers that return ORM
+rows use json_response() instead, which validates the rows against the
+response schema once and dumps them straight to bytes in pydantic-core. The
+route's response_model is then used only for the OpenAPI docs, so FastAPI does
+not validate and encode the data a second time.
+"""
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+from functools import lru_cache
+import orjson
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+@lru_cache(maxsize=None)
+def _adapter(schema):
+    return TypeAdapter(schema)
+
+def dump_json(schema, obj) -> bytes:
+    """Validate ORM rows, dicts or models against schema and return JSON bytes"""
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+def json_response(schema, obj, status_code: int = 200, headers=None) -> Response:
+    return Response(content=dump_json(schema, obj), status_code=status_code, headers=headers, media_type="application/json")
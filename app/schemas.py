@@ -1,5 +1,6 @@
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, EmailStr, validator
+from datetime import datetime
 import re
 
 class PriceModel(BaseModel):
@@ -42,6 +43,13 @@ class CoffeeProduct(CoffeeProductBase):
     class Config:
         from_attributes = True
 
+class ProductPage(BaseModel):
+    items: List[CoffeeProduct]
+    next_cursor: Optional[str] = None
+
+class CategoryList(BaseModel):
+    categories: List[str]
+
 class UserBase(BaseModel):
     username: str
     email: EmailStr
@@ -74,6 +82,10 @@ class User(UserBase):
     is_active: bool
     is_admin: bool
 
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -96,11 +108,50 @@ class OrderItem(BaseModel):
 class OrderCreate(BaseModel):
     items: List[OrderItem]
 
+class OrderLine(OrderItem):
+    unit_price: Optional[float] = None
+    line_total: Optional[float] = None
+
 class Order(BaseModel):
     id: int
     user_id: int
-    items: List[OrderItem]
+    items: List[OrderLine]
     total_price: float
     status: str = "pending"
     created_at: str
 
+    @validator('created_at', pre=True)
+    def format_created_at(cls, v):
+        return v.isoformat() if isinstance(v, datetime) else v
+
+    class Config:
+        from_attributes = True
+
+class OrderPage(BaseModel):
+    items: List[Order]
+    next_cursor: Optional[str] = None
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate]
+
+class OrderBatchResult(BaseModel):
+    index: int
+    status_code: int
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+class OrderBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBatchResult]
+
+class ProductSales(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    size: Optional[str] = None
+    quantity: int
+    revenue: float
+    orders: int
+
+class SalesReport(BaseModel):
+    items: List[ProductSales]
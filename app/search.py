@@ -0,0 +1,111 @@
+from sqlalchemy import text, or_, cast, String
+import re
+import logging
+from . import models
+
+SEARCH_TABLE = "coffee_products_fts"
+
+# SQLite: external-content FTS5 table kept in sync with coffee_products by triggers,
+# so every write path (API, release seeding, load_products.py) updates the index.
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, description, ingredients, category,
+        content='coffee_products', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON coffee_products BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, ingredients, category)
+        VALUES (new.id, new.name, new.description, new.ingredients, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON coffee_products BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description, ingredients, category)
+        VALUES ('delete', old.id, old.name, old.description, old.ingredients, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE ON coffee_products BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description, ingredients, category)
+        VALUES ('delete', old.id, old.name, old.description, old.ingredients, old.category);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, ingredients, category)
+        VALUES (new.id, new.name, new.description, new.ingredients, new.category);
+    END""",
+]
+
+# Column weights for bm25(): name, description, ingredients, category
+_SQLITE_QUERY = f"""
+    SELECT rowid FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH :query
+    ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0, 3.0, 5.0), rowid
+    LIMIT :limit OFFSET :offset
+"""
+
+# PostgreSQL: the GIN expression index is maintained by the database itself, so
+# it can never drift from the table. Queries must repeat the exact expression.
+_PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(ingredients::text, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'D')"
+)
+
+_PG_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_coffee_products_search ON coffee_products USING GIN (({_PG_DOCUMENT}))",
+]
+
+_PG_QUERY = f"""
+    SELECT id FROM coffee_products
+    WHERE ({_PG_DOCUMENT}) @@ to_tsquery('english', :query)
+    ORDER BY ts_rank(({_PG_DOCUMENT}), to_tsquery('english', :query)) DESC, id
+    LIMIT :limit OFFSET :offset
+"""
+
+def _tokens(q: str):
+    return re.findall(r"\w+", q.lower())
+
+def init_search_index(conn):
+    """Create the full-text index for the connection's dialect (idempotent)"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SEARCH_TABLE}
+        ).first()
+        for statement in _SQLITE_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in _PG_DDL:
+            conn.execute(text(statement))
+    else:
+        logging.warning(f"No full-text index for dialect {dialect}; search falls back to LIKE")
+
+def search_product_ids(db, q: str, skip: int = 0, limit: int = 20):
+    """Return product ids matching q, best match first"""
+    tokens = _tokens(q)
+    if not tokens:
+        return []
+    params = {"limit": limit, "offset": skip}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        params["query"] = " ".join(f'"{token}"*' for token in tokens)
+        return [row[0] for row in db.execute(text(_SQLITE_QUERY), params)]
+    if dialect == "postgresql":
+        params["query"] = " & ".join(f"{token}:*" for token in tokens)
+        return [row[0] for row in db.execute(text(_PG_QUERY), params)]
+
+    product = models.CoffeeProduct
+    query = db.query(product.id)
+    for token in tokens:
+        query = query.filter(or_(
+            product.name.ilike(f"%{token}%"),
+            product.description.ilike(f"%{token}%"),
+            cast(product.ingredients, String).ilike(f"%{token}%"),
+            product.category.ilike(f"%{token}%"),
+        ))
+    return [row[0] for row in query.order_by(product.id).offset(skip).limit(limit)]
+
+def search_products(db, q: str, skip: int = 0, limit: int = 20):
+    """Return ranked CoffeeProduct rows matching q"""
+    ids = search_product_ids(db, q, skip, limit)
+    if not ids:
+        return []
+    products = db.query(models.CoffeeProduct).filter(models.CoffeeProduct.id.in_(ids)).all()
+    by_id = {product.id: product for product in products}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
@@ -0,0 +1,95 @@
+"""Incrementally maintained dashboard counters.
+
+Write paths add deltas to rows of stats_counters inside their own transaction,
+so the admin dashboard reads a handful of rows instead of counting tables.
+recompute() rebuilds every counter from one aggregate statement; release.py
+reruns it to correct any drift (migration 4 seeded the table with a frozen copy).
+"""
+from sqlalchemy import select, update, delete, insert, func, case, bindparam
+from sqlalchemy.orm import Session
+from . import models
+
+_counters = models.StatsCounter.__table__
+
+_INCREMENT = update(_counters).where(
+    _counters.c.name == bindparam("counter")
+).values(value=_counters.c.value + bindparam("delta"))
+
+def status_counter(status: str) -> str:
+    return f"orders_{status}"
+
+def bump(db: Session, deltas: dict):
+    """Add deltas ({counter name: amount}) to the counters in the current transaction"""
+    params = [{"counter": name, "delta": delta} for name, delta in deltas.items() if delta]
+    if params:
+        db.execute(_INCREMENT, params)
+
+def order_created(total_price: float, orders: int = 1) -> dict:
+    return {"orders": orders, status_counter("pending"): orders, "revenue": total_price}
+
+def status_changed(old: str, new: str, total_price: float) -> dict:
+    if old == new:
+        return {}
+    deltas = {status_counter(old): -1, status_counter(new): 1}
+    # Revenue excludes cancelled orders
+    if new == "cancelled":
+        deltas["revenue"] = -total_price
+    elif old == "cancelled":
+        deltas["revenue"] = total_price
+    return deltas
+
+def aggregate_query():
+    """Every counter's true value in a single statement"""
+    order_columns = [
+        func.count(models.Order.id).label("orders"),
+        func.coalesce(func.sum(
+            case((models.Order.status != "cancelled", models.Order.total_price), else_=0.0)
+        ), 0.0).label("revenue"),
+    ] + [
+        func.coalesce(func.sum(case((models.Order.status == status, 1), else_=0)), 0).label(status_counter(status))
+        for status in models.ORDER_STATUSES
+    ]
+    return select(
+        select(func.count()).select_from(models.User).scalar_subquery().label("users"),
+        select(func.count()).select_from(models.CoffeeProduct).scalar_subquery().label("products"),
+        *order_columns
+    ).select_from(models.Order)
+
+_SET = update(_counters).where(
+    _counters.c.name == bindparam("counter")
+).values(value=bindparam("total"))
+
+def recompute(db: Session) -> dict:
+    """Rebuild all counters from the tables; the caller commits.
+
+    The counter rows are locked before the tables are counted, so a write
+    bumping them waits for the caller's commit and lands on top of the rebuilt
+    values instead of being counted and then overwritten (or lost)."""
+    db.execute(update(_counters).values(value=_counters.c.value))
+    values = dict(db.execute(aggregate_query()).one()._mapping)
+    existing = set(db.execute(select(_counters.c.name)).scalars())
+    db.execute(delete(_counters).where(_counters.c.name.not_in(values)))
+    updates = [{"counter": name, "total": value or 0} for name, value in values.items() if name in existing]
+    if updates:
+        db.execute(_SET, updates)
+    inserts = [{"name": name, "value": value or 0} for name, value in values.items() if name not in existing]
+    if inserts:
+        db.execute(insert(_counters), inserts)
+    return values
+
+def read(rows) -> dict:
+    """Dashboard payload from (name, value) counter rows"""
+    values = {name: value for name, value in rows}
+    return {
+        "total_users": int(values.get("users", 0)),
+        "total_products": int(values.get("products", 0)),
+        "total_orders": int(values.get("orders", 0)),
+        "pending_orders": int(values.get(status_counter("pending"), 0)),
+        "orders_by_status": {
+            status: int(values.get(status_counter(status), 0)) for status in models.ORDER_STATUSES
+        },
+        "revenue": round(values.get("revenue", 0.0), 2),
+    }
+
+def counters_query():
+    return select(_counters.c.name, _counters.c.value)
@@ -0,0 +1,84 @@
+"""Version stamps shared by every worker process.
+
+Per-process caches only see the writes their own process makes. Each cached
+domain has a row in cache_versions that every write to it bumps inside its own
+transaction; a process compares the row with the version its caches were
+filled at and clears them when another process has written since.
+
+How often the row is read is the domain's check interval: 0 reads it on every
+check (changes take effect at once), a positive interval bounds how long
+another worker's write can go unnoticed in exchange for fewer queries. The
+writing process clears its own caches immediately either way.
+"""
+from sqlalchemy import select, update
+from datetime import datetime, timezone
+import threading
+import time
+from . import models
+from .config import settings
+
+_versions = models.CacheVersion.__table__
+
+class SharedVersion:
+    def __init__(self, name: str, check_interval: float):
+        self.name = name
+        self.check_interval = check_interval
+        self.version = None
+        self.updated_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self.caches = []
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def track(self, cache):
+        """Clear cache whenever the shared version moves"""
+        self.caches.append(cache)
+        return cache
+
+    def _clear(self):
+        for cache in self.caches:
+            cache.clear()
+
+    def bump(self, db):
+        """Mark the domain changed in the caller's transaction"""
+        db.execute(
+            update(_versions).where(_versions.c.name == self.name)
+            .values(version=_versions.c.version + 1, updated_at=datetime.utcnow())
+        )
+
+    def invalidate(self):
+        """After committing a bump: clear this process's caches and re-read next time"""
+        with self._lock:
+            self._clear()
+            self._checked = float("-inf")
+
+    def stale(self) -> bool:
+        return time.monotonic() - self._checked >= self.check_interval
+
+    def refresh(self, db):
+        """Read the shared version, clearing the caches if another process wrote"""
+        row = db.execute(
+            select(_versions.c.version, _versions.c.updated_at).where(_versions.c.name == self.name)
+        ).first()
+        version, updated_at = row if row is not None else (0, None)
+        with self._lock:
+            if version != self.version:
+                self._clear()
+                self.version = version
+                if updated_at is not None:
+                    self.updated_at = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+            self._checked = time.monotonic()
+        return self.version, self.updated_at
+
+    def snapshot(self):
+        return self.version, self.updated_at
+
+    def current(self, db):
+        """(version, last modified), read from the database at most once per check interval"""
+        if self.stale():
+            return self.refresh(db)
+        return self.snapshot()
+
+# Product catalog: cached bodies, validators and price tables
+catalog = SharedVersion("catalog", settings.catalog_version_check_interval)
+# User snapshots used for authorization (is_active, is_admin)
+auth = SharedVersion("auth", settings.auth_version_check_interval)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of the API under a mixed coffee-shop workload.
+
+Drives app.main:app in-process through httpx's ASGI transport (no server or
+network) against a temporary SQLite database seeded from
+data/processed_coffee_products.json. Virtual users pick scenarios by weight:
+menu browse, search, login, order placement, order polling and the admin
+dashboard. Prints RPS and p50/p95/p99 per endpoint and writes the results as
+JSON; pass an earlier result file as --baseline to compare two commits.
+
+    python benchmarks/load_test.py --users 20 --duration 15
+    python benchmarks/load_test.py --baseline benchmarks/results/load_test-<commit>.json
+
+Rate limits are disabled unless --rate-limits is given, since every virtual
+user shares one client address. Logins hash with BCRYPT_ROUNDS (--bcrypt-rounds).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+PASSWORD = "LoadTest123"
+SEARCH_TERMS = ["latte", "mocha", "cold brew", "espresso", "caramel", "chocolate", "tea", "vanilla"]
+
+# name: (weight, coroutine function); weights are relative
+SCENARIOS = {}
+
+def scenario(name: str, weight: int):
+    def register(fn):
+        SCENARIOS[name] = (weight, fn)
+        return fn
+    return register
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, status: int, seconds: float):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+class VirtualUser:
+    def __init__(self, client, stats: Stats, rng: random.Random, username: str, products, admin_headers):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.username = username
+        self.products = products
+        self.admin_headers = admin_headers
+        self.headers = {}
+        self.order_ids = []
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.stats.record(endpoint, response.status_code, time.perf_counter() - start)
+        return response
+
+    async def login(self):
+        response = await self.request(
+            "POST /auth/token", "POST", "/auth/token", data={"username": self.username, "password": PASSWORD}
+        )
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def place_order(self):
+        items = []
+        for product in self.rng.sample(self.products, self.rng.randint(1, 3)):
+            items.append({
+                "product_id": product["id"],
+                "size": self.rng.choice(product["sizes"]),
+                "quantity": self.rng.randint(1, 2),
+            })
+        response = await self.request(
+            "POST /api/v1/orders", "POST", "/api/v1/orders", json={"items": items}, headers=self.headers
+        )
+        if response.status_code == 200:
+            self.order_ids.append(response.json()["id"])
+
+@scenario("browse", 30)
+async def browse(user: VirtualUser):
+    await user.request("GET /api/v1/products", "GET", "/api/v1/products", params={"limit": 20})
+    product = user.rng.choice(user.products)
+    await user.request("GET /api/v1/products/{id}", "GET", f"/api/v1/products/{product['id']}")
+    if user.rng.random() < 0.3:
+        await user.request("GET /api/v1/products/categories", "GET", "/api/v1/products/categories")
+
+@scenario("search", 15)
+async def search(user: VirtualUser):
+    await user.request(
+        "GET /api/v1/products/search", "GET", "/api/v1/products/search", params={"q": user.rng.choice(SEARCH_TERMS)}
+    )
+
+@scenario("login", 5)
+async def login(user: VirtualUser):
+    await user.login()
+
+@scenario("order", 15)
+async def order(user: VirtualUser):
+    await user.place_order()
+
+@scenario("poll", 25)
+async def poll(user: VirtualUser):
+    if user.order_ids:
+        order_id = user.rng.choice(user.order_ids[-5:])
+        await user.request("GET /api/v1/orders/{id}", "GET", f"/api/v1/orders/{order_id}", headers=user.headers)
+    await user.request("GET /api/v1/orders", "GET", "/api/v1/orders", params={"limit": 10}, headers=user.headers)
+
+@scenario("admin", 10)
+async def admin(user: VirtualUser):
+    await user.request("GET /api/v1/admin/stats", "GET", "/api/v1/admin/stats", headers=user.admin_headers)
+    await user.request(
+        "GET /api/v1/admin/orders", "GET", "/api/v1/admin/orders", params={"limit": 20}, headers=user.admin_headers
+    )
+
+def configure_environment(workdir: str, args):
+    """Point the app at a scratch database; must run before app is imported"""
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load_test.db')}",
+        RATE_LIMIT_STORAGE_URI=f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}",
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+    )
+    if args.bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+def seed(users: int):
+    """Products from the data file, the virtual users and an admin; returns the products"""
+    from app import models, stats
+    from app.database import SessionLocal, init_db
+    from app.hashing import get_password_hash
+
+    init_db()
+    with open(os.path.join(ROOT, "data", "processed_coffee_products.json")) as f:
+        catalog = json.load(f)
+    hashed_password = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        for product in catalog:
+            product = dict(product)
+            product.pop("id", None)
+            db.add(models.CoffeeProduct(**product))
+        for i in range(users):
+            db.add(models.User(username=f"user{i}", email=f"user{i}@example.com", hashed_password=hashed_password))
+        db.add(models.User(
+            username="loadadmin", email="loadadmin@example.com", hashed_password=hashed_password, is_admin=True
+        ))
+        db.commit()
+        stats.recompute(db)
+        db.commit()
+        products = db.query(models.CoffeeProduct).filter(models.CoffeeProduct.is_available.is_(True)).all()
+        return [{"id": product.id, "sizes": list(product.sizes)} for product in products if product.sizes]
+    finally:
+        db.close()
+
+async def run(args, products):
+    import httpx
+    from app.main import app
+
+    app.state.limiter.enabled = args.rate_limits
+    stats = Stats()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        setup = Stats()
+        admin = VirtualUser(client, setup, random.Random(args.seed), "loadadmin", products, {})
+        await admin.login()
+        users = [
+            VirtualUser(client, setup, random.Random(args.seed + i + 1), f"user{i}", products, admin.headers)
+            for i in range(args.users)
+        ]
+        # Every user starts logged in with an order to poll
+        await asyncio.gather(*(user.login() for user in users))
+        await asyncio.gather(*(user.place_order() for user in users))
+
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[name][0] for name in names]
+        measure_from = time.perf_counter() + args.warmup
+        measure_until = measure_from + args.duration
+
+        async def loop(user: VirtualUser):
+            while (now := time.perf_counter()) < measure_until:
+                user.stats = stats if now >= measure_from else setup
+                await SCENARIOS[user.rng.choices(names, weights)[0]][1](user)
+
+        await asyncio.gather(*(loop(user) for user in users))
+        elapsed = time.perf_counter() - measure_from
+    return stats, elapsed
+
+def percentile(ordered, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(latencies, statuses, elapsed: float):
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report(stats: Stats, elapsed: float, args):
+    overall_statuses = defaultdict(int)
+    for statuses in stats.statuses.values():
+        for status, count in statuses.items():
+            overall_statuses[status] += count
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users, "duration": args.duration, "warmup": args.warmup, "seed": args.seed,
+            "rate_limits": args.rate_limits, "bcrypt_rounds": int(os.environ.get("BCRYPT_ROUNDS", "12")),
+            "async_database": os.environ.get("ASYNC_DATABASE", "false").lower() == "true",
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize([s for latencies in stats.latencies.values() for s in latencies], overall_statuses, elapsed),
+        "endpoints": {
+            endpoint: summarize(stats.latencies[endpoint], stats.statuses[endpoint], elapsed)
+            for endpoint in sorted(stats.latencies)
+        },
+    }
+
+def _change(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+def print_report(results, baseline=None):
+    header = f"{'endpoint':<36} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        header += f" {'Δrps':>8} {'Δp95':>8}"
+    print(header)
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for endpoint, row in rows:
+        line = (
+            f"{endpoint:<36} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+        if baseline:
+            old = baseline["overall"] if endpoint == "overall" else baseline["endpoints"].get(endpoint)
+            if old:
+                line += f" {_change(row['rps'], old['rps']):>8} {_change(row['p95_ms'], old['p95_ms']):>8}"
+        print(line)
+    if baseline:
+        print(f"baseline: {baseline.get('commit')} ({baseline.get('timestamp')})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before measuring")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for scenario choice")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS for the run")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the rate limiter enabled")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/load_test-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="coffee_shop_load_test_") as workdir:
+        configure_environment(workdir, args)
+        products = seed(args.users)
+        stats, elapsed = asyncio.run(run(args, products))
+        from app.hashing import hashing_executor
+        hashing_executor.shutdown()
+
+    results = report(stats, elapsed, args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"load_test-{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the functions on the request hot paths.
+
+Covers order pricing (price_order / PriceTable.resolve / normalize_size, on
+small and large item lists), JWT encode/decode (create_access_token,
+decode_token, get_current_user on a cached user), CoffeeProduct and Order
+serialization (responses.dump_json), the UserCreate validators and bcrypt
+hashing/verification.
+
+Each benchmark is calibrated so a sample runs for at least --min-time seconds,
+warmed up, then timed over --repeat samples; the table shows the median,
+spread and throughput per call. Allocations are measured in a separate
+tracemalloc pass so tracing doesn't skew the timings: the peak bytes one call
+allocates and the bytes still held after many calls (a leak shows up there).
+
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py -k pricing -k jwt --repeat 20
+    python benchmarks/microbench.py --json microbench.json
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+PRODUCTS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_coffee_products.json')
+
+# name: zero-argument callable factory, registered in display order
+BENCHMARKS = {}
+
+def bench(name: str):
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+def load_catalog():
+    with open(PRODUCTS_FILE) as f:
+        catalog = json.load(f)
+    for product_id, product in enumerate(catalog, start=1):
+        product["id"] = product_id
+    return catalog
+
+def order_items(catalog, count: int):
+    from app import schemas
+    # Cycle through products and their sizes, spelled the ways clients send them
+    spellings = [lambda size: size, lambda size: size.split()[0].lower(), lambda size: size.upper()]
+    items = []
+    for i in range(count):
+        product = catalog[i % len(catalog)]
+        size = product["sizes"][i % len(product["sizes"])]
+        items.append(schemas.OrderItem(
+            product_id=product["id"], size=spellings[i % len(spellings)](size), quantity=1 + i % 3
+        ))
+    return items
+
+def price_tables(catalog):
+    from app.pricing import PriceTable
+    return {product["id"]: PriceTable(product["id"], product["sizes"], product["prices"]) for product in catalog}
+
+def _price_order(items):
+    from app.pricing import price_order
+    tables = price_tables(load_catalog())
+    return lambda: price_order(items, None, tables)
+
+@bench("pricing: price_order, 3 items")
+def price_order_small():
+    return _price_order(order_items(load_catalog(), 3))
+
+@bench("pricing: price_order, 500 items")
+def price_order_large():
+    return _price_order(order_items(load_catalog(), 500))
+
+@bench("pricing: PriceTable.resolve")
+def price_table_resolve():
+    table = price_tables(load_catalog())[1]
+    return lambda: table.resolve("Large (16oz)")
+
+@bench("pricing: normalize_size")
+def normalize_size():
+    from app.pricing import normalize_size
+    return lambda: normalize_size("Venti (20oz)")
+
+@bench("pricing: build PriceTable")
+def build_price_table():
+    from app.pricing import PriceTable
+    product = load_catalog()[0]
+    return lambda: PriceTable(product["id"], product["sizes"], product["prices"])
+
+@bench("jwt: create_access_token")
+def jwt_encode():
+    from app.auth_router import create_access_token
+    return lambda: create_access_token({"sub": "alice"})
+
+@bench("jwt: decode_token (uncached)")
+def jwt_decode():
+    from app.auth_router import create_access_token, decode_token, token_cache
+    token = create_access_token({"sub": "alice"})
+
+    def run():
+        token_cache.delete(token)
+        return decode_token(token)
+    return run
+
+@bench("jwt: decode_token (cached)")
+def jwt_decode_cached():
+    from app.auth_router import create_access_token, decode_token
+    token = create_access_token({"sub": "alice"})
+    decode_token(token)
+    return lambda: decode_token(token)
+
+@bench("jwt: get_current_user (cached user)")
+def current_user():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app import models, schemas, versions
+    from app.auth_router import create_access_token, get_current_user, user_cache
+    # The shared auth version is re-read once per check interval, as in a
+    # worker; an in-memory database holds it
+    engine = create_engine("sqlite://")
+    models.CacheVersion.__table__.create(engine)
+    db = Session(engine)
+    versions.auth.refresh(db)
+    token = create_access_token({"sub": "alice"})
+    user_cache.set("alice", schemas.User(id=1, username="alice", email="alice@example.com", is_active=True, is_admin=False))
+    return lambda: get_current_user(token, db)
+
+def product_rows(count: int):
+    from app import models
+    catalog = load_catalog()
+    return [models.CoffeeProduct(**catalog[i % len(catalog)]) for i in range(count)]
+
+def order_rows(count: int, lines: int):
+    from app import models
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    orders = []
+    for order_id in range(1, count + 1):
+        items = [
+            models.OrderItem(
+                id=order_id * 100 + i, order_id=order_id, product_id=i + 1, size="Large (16oz)", quantity=2,
+                unit_price=4.75, line_total=9.5, customizations=["Extra shot"],
+            )
+            for i in range(lines)
+        ]
+        orders.append(models.Order(
+            id=order_id, user_id=1, items=items, total_price=9.5 * lines, status="pending", created_at=created_at
+        ))
+    return orders
+
+@bench("schema: CoffeeProduct x1")
+def product_dump():
+    from app import schemas
+    from app.responses import dump_json
+    row = product_rows(1)[0]
+    return lambda: dump_json(schemas.CoffeeProduct, row)
+
+@bench("schema: CoffeeProduct x100")
+def product_page_dump():
+    from typing import List
+    from app import schemas
+    from app.responses import dump_json
+    rows = product_rows(100)
+    return lambda: dump_json(List[schemas.CoffeeProduct], rows)
+
+@bench("schema: Order (3 lines) x1")
+def order_dump():
+    from app import schemas
+    from app.responses import dump_json
+    row = order_rows(1, 3)[0]
+    return lambda: dump_json(schemas.Order, row)
+
+@bench("schema: Order (3 lines) x100")
+def order_page_dump():
+    from typing import List
+    from app import schemas
+    from app.responses import dump_json
+    rows = order_rows(100, 3)
+    return lambda: dump_json(List[schemas.Order], rows)
+
+@bench("schema: UserCreate valid")
+def user_create_valid():
+    from app import schemas
+    data = {"username": "coffee_fan_42", "email": "fan@example.com", "password": "Espresso123"}
+    return lambda: schemas.UserCreate(**data)
+
+@bench("schema: UserCreate invalid password")
+def user_create_invalid():
+    from pydantic import ValidationError
+    from app import schemas
+    data = {"username": "coffee_fan_42", "email": "fan@example.com", "password": "espresso123"}
+
+    def run():
+        try:
+            schemas.UserCreate(**data)
+        except ValidationError:
+            pass
+    return run
+
+@bench("bcrypt: get_password_hash")
+def bcrypt_hash():
+    from app.hashing import get_password_hash
+    return lambda: get_password_hash("Espresso123")
+
+@bench("bcrypt: verify_password")
+def bcrypt_verify():
+    from app.hashing import get_password_hash, verify_password
+    hashed = get_password_hash("Espresso123")
+    return lambda: verify_password("Espresso123", hashed)
+
+def calibrate(fn, min_time: float) -> int:
+    """Smallest power-of-ten loop count whose sample takes at least min_time"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time or loops >= 10 ** 7:
+            return loops
+        loops *= 10
+
+def time_samples(fn, loops: int, repeat: int):
+    """Seconds per call for each sample"""
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+def allocations(fn, calls: int):
+    """(peak bytes allocated by one call, bytes still held after calls)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+        per_call_peak = max(peak - baseline, 0)
+        for _ in range(calls):
+            fn()
+        gc.collect()
+        retained = max(tracemalloc.get_traced_memory()[0] - current, 0)
+    finally:
+        tracemalloc.stop()
+    return per_call_peak, retained
+
+def _noop():
+    pass
+
+def run_benchmark(name: str, args, alloc_overhead: int = 0):
+    fn = BENCHMARKS[name]()
+    loops = calibrate(fn, args.min_time)
+    time_samples(fn, loops, args.warmup)
+    samples = time_samples(fn, loops, args.repeat)
+    peak, retained = allocations(fn, min(loops * 10, 1000))
+    peak = max(peak - alloc_overhead, 0)
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        "loops": loops,
+        "samples": len(samples),
+        "median_us": median * 1e6,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "stdev_us": statistics.stdev(samples) * 1e6 if len(samples) > 1 else 0.0,
+        "min_us": min(samples) * 1e6,
+        "ops_per_sec": 1 / median if median else 0.0,
+        "peak_alloc_bytes": peak,
+        "retained_bytes": retained,
+    }
+
+def _format_us(us: float) -> str:
+    return f"{us / 1000:.2f}ms" if us >= 1000 else f"{us:.2f}µs"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="patterns", action="append", default=[], help="only run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=10, help="timed samples per benchmark")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed samples before timing")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    # Settings are read on import, so configure the environment first
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    names = [name for name in BENCHMARKS if not args.patterns or any(p in name for p in args.patterns)]
+    print(f"{'benchmark':<40} {'median':>10} {'± stdev':>10} {'min':>10} {'ops/s':>12} {'peak alloc':>11} {'retained':>9}")
+    # tracemalloc's own bookkeeping, subtracted from each peak
+    alloc_overhead = allocations(_noop, 10)[0]
+    results = []
+    for name in names:
+        result = run_benchmark(name, args, alloc_overhead)
+        results.append(result)
+        print(
+            f"{name:<40} {_format_us(result['median_us']):>10} {_format_us(result['stdev_us']):>10} "
+            f"{_format_us(result['min_us']):>10} {result['ops_per_sec']:>12,.0f} "
+            f"{result['peak_alloc_bytes']:>10,}B {result['retained_bytes']:>8,}B"
+        )
+
+    from app.config import settings
+    print(f"bcrypt rounds: {settings.bcrypt_rounds}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"bcrypt_rounds": settings.bcrypt_rounds, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
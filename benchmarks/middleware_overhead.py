@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the request middleware stack.
+
+Compares the former SecurityHeadersMiddleware + LoggingMiddleware pair
+(BaseHTTPMiddleware subclasses) with the pure ASGI RequestContextMiddleware,
+calling the ASGI app directly so no server or network is involved.
+
+    python benchmarks/middleware_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware import RequestContextMiddleware
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        request_id = str(uuid.uuid4())
+        logging.info(f"Request {request_id}: {request.method} {request.url}")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logging.info(f"Response {request_id}: {response.status_code} - {process_time:.3f}s")
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+def build_app(stack: str):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "legacy":
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacyLoggingMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(RequestContextMiddleware)
+    return app
+
+async def call(app):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+async def run(stack: str, requests: int, rounds: int):
+    app = build_app(stack)
+    for _ in range(min(requests, 1000)):
+        await call(app)
+    per_request = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await call(app)
+        per_request.append((time.perf_counter() - start) / requests * 1e6)
+    return per_request
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--with-logging", action="store_true", help="keep INFO request logs enabled")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.with_logging else logging.WARNING, stream=sys.stderr)
+
+    results = {stack: asyncio.run(run(stack, args.requests, args.rounds)) for stack in ("none", "legacy", "asgi")}
+    baseline = statistics.median(results["none"])
+    print(f"{'stack':<8} {'median µs/req':>14} {'stdev':>8} {'overhead µs':>12}")
+    for stack, samples in results.items():
+        median = statistics.median(samples)
+        stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+        print(f"{stack:<8} {median:>14.1f} {stdev:>8.1f} {median - baseline:>12.1f}")
+
+if __name__ == "__main__":
+    main()
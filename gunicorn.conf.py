@@ -0,0 +1,82 @@
+"""Gunicorn settings for production: uvicorn workers under a gunicorn master.
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+The master imports the app once (preload_app) and forks the workers from it.
+Each worker is recycled after roughly GUNICORN_MAX_REQUESTS requests to
+contain memory creep. On SIGTERM the workers stop accepting connections, drain
+in-flight requests for up to GUNICORN_GRACEFUL_TIMEOUT seconds and run the
+app's shutdown handlers, which close the database pools.
+
+Reloads without dropping connections:
+  kill -HUP <master>   new workers with the re-read config, then old workers
+                       drain. Application code is not reloaded while
+                       preload_app is on, because workers fork from the
+                       master's already-imported app.
+  kill -USR2 <master>  start a new master running the new code next to the
+                       old one; once it is serving, send the old master
+                       WINCH (stop its workers) and then TERM.
+"""
+import os
+import tempfile
+
+def _cpu_count():
+    try:
+        # CPUs this process may run on (respects container/cgroup pinning)
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+# Each uvicorn worker runs an event loop plus a thread pool for sync handlers,
+# so one per core keeps the CPUs busy; Heroku sets WEB_CONCURRENCY per dyno size.
+# Every worker opens its own pool of up to DB_POOL_SIZE + DB_MAX_OVERFLOW
+# connections, so keep workers x that under the database's connection limit.
+workers = int(os.getenv("WEB_CONCURRENCY") or _cpu_count())
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+# Stagger the restarts so the workers don't all recycle at once
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# Heroku sends SIGKILL 30 seconds after SIGTERM
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "25"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = None  # the app writes its own access log
+# forwarded_allow_ips stays at its default: X-Forwarded-For is client-writable
+# up to the router's own entry, so the client address is read from that entry
+# by the app (TRUSTED_PROXY_HOPS) rather than taken leftmost by uvicorn
+
+# Workers must not migrate: on_starting already did, in the master, and SQLite
+# has no lock to stop concurrently starting workers racing on the version row.
+# Set before the app (and its settings) is imported, here or after fork.
+os.environ["MIGRATE_ON_STARTUP"] = "false"
+
+# Aggregate Prometheus metrics across workers. This has to be set before the
+# app (and prometheus_client) is imported, and the directory must start empty.
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="coffee_shop_metrics_")
+
+def on_starting(server):
+    # Migrate once in the master, before any worker starts
+    from app.database import init_db
+    init_db()
+
+def post_fork(server, worker):
+    from app import database, logging_config
+    from app.config import settings
+
+    # Connections opened in the master must not be shared with the workers;
+    # drop the inherited pools without closing the master's sockets
+    database.engine.dispose(close=False)
+    if database.async_engine is not None:
+        database.async_engine.sync_engine.dispose(close=False)
+    # The log listener thread doesn't survive fork
+    logging_config.restart_logging(settings)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
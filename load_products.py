@@ -2,6 +2,7 @@ import json
 from sqlalchemy.orm import Session
 from app.models import CoffeeProduct
 from app.database import SessionLocal, init_db
+from app import versions
 
 def load_products(json_path):
     with open(json_path, 'r') as f:
@@ -13,6 +14,7 @@ def load_products(json_path):
         prod_data.pop('id', None)
         db_product = CoffeeProduct(**prod_data)
         db.add(db_product)
+    versions.catalog.bump(db)
     db.commit()
     db.close()
 
@@ -10,14 +10,17 @@ from sqlalchemy.orm import Session
 sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
 
 from app.models import CoffeeProduct, User
-from app.database import SessionLocal, init_db
+from app.database import SessionLocal, engine
+from app import migrations, stats, versions
 from app.auth_router import get_password_hash
 
 def run_migrations():
-    """Initialize database tables"""
-    print("🔄 Initializing database...")
-    init_db()
-    print("✅ Database initialized")
+    """Apply pending schema migrations"""
+    print("🔄 Running database migrations...")
+    for version, description in migrations.pending(engine):
+        print(f"   {version}: {description}")
+    applied = migrations.upgrade(engine)
+    print(f"✅ Applied {len(applied)} migration(s)" if applied else "✅ Database schema is up to date")
 
 def seed_products():
     """Load coffee products if they don't exist"""
@@ -42,7 +45,9 @@ def seed_products():
                 existing_product = db.query(CoffeeProduct).filter(CoffeeProduct.name == prod['name']).first()
                 if existing_product:
                     existing_product.category = prod['category']
-                    
+            
+            # Running workers drop their cached menus
+            versions.catalog.bump(db)
             db.commit()
             print("✅ Updated product categories")
             return
@@ -55,6 +60,7 @@ def seed_products():
             db_product = CoffeeProduct(**prod_data)
             db.add(db_product)
         
+        versions.catalog.bump(db)
         db.commit()
         print(f"✅ Loaded {len(products)} coffee products")
         
@@ -95,11 +101,25 @@ def create_admin_user():
     finally:
         db.close()
 
+def recompute_stats():
+    """Rebuild the dashboard counters, picking up rows written outside the API"""
+    db: Session = SessionLocal()
+    try:
+        stats.recompute(db)
+        db.commit()
+        print("✅ Recomputed dashboard counters")
+    except Exception as e:
+        print(f"❌ Error recomputing dashboard counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     print("🚀 Running Heroku release tasks...")
     
     run_migrations()
     seed_products()
     create_admin_user()
+    recompute_stats()
     
     print("✅ Release tasks completed!")
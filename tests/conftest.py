@@ -0,0 +1,102 @@
+"""Shared fixtures: the app on a throwaway SQLite database.
+
+Settings are read when app.config is imported, so the environment is set up
+before anything from app is imported. The suite runs the sync routers; run it
+with ASYNC_DATABASE=true to exercise the async ones.
+"""
+import json
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="coffee-shop-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["RATE_LIMIT_STORAGE_URI"] = f"sqlite:///{os.path.join(_tmp, 'ratelimit.db')}"
+os.environ["LOG_FILE"] = ""
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.setdefault("ASYNC_DATABASE", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+PRODUCTS_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "processed_coffee_products.json")
+PASSWORD = "Espresso123"
+
+@pytest.fixture(scope="session")
+def app():
+    from app.main import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(autouse=True)
+def clean_state(client, app):
+    """Empty tables, caches and rate-limit counters before every test"""
+    from app import models, stats, pricing, auth_router, product_router
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        kept = {models.StatsCounter.__table__, models.CacheVersion.__table__}
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table not in kept:
+                db.execute(delete(table))
+        stats.recompute(db)
+        db.commit()
+    for cache in (product_router.catalog_cache, pricing.price_table_cache, auth_router.token_cache, auth_router.user_cache):
+        cache.clear()
+    app.state.limiter.reset()
+    app.state.limiter.enabled = False
+    yield
+    app.state.limiter.enabled = True
+
+@pytest.fixture
+def db():
+    from app.database import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+def catalog(count: int = None):
+    with open(PRODUCTS_FILE) as f:
+        products = json.load(f)
+    for product in products:
+        product.pop("id", None)
+    return products[:count]
+
+@pytest.fixture
+def products(client):
+    """The first few catalog products, created through the API"""
+    created = []
+    for product in catalog(5):
+        response = client.post("/api/v1/products", json=product)
+        assert response.status_code == 200, response.text
+        created.append(response.json())
+    return created
+
+@pytest.fixture
+def make_user(client):
+    """make_user(name, admin=False) registers a user and returns auth headers"""
+    def make(username: str, admin: bool = False):
+        from app import models
+        from app.database import SessionLocal
+        response = client.post("/auth/register", json={
+            "username": username, "email": f"{username}@example.com", "password": PASSWORD,
+        })
+        assert response.status_code == 200, response.text
+        if admin:
+            with SessionLocal() as session:
+                session.query(models.User).filter(models.User.username == username).update({"is_admin": True})
+                session.commit()
+        token = client.post("/auth/token", data={"username": username, "password": PASSWORD}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+@pytest.fixture
+def alice(make_user):
+    return make_user("alice")
+
+@pytest.fixture
+def admin(make_user):
+    return make_user("boss", admin=True)
@@ -0,0 +1,49 @@
+from app import models, versions
+from app.database import SessionLocal
+from app.querylog import assert_query_budget
+
+def set_user(username, **values):
+    """Write as another worker would: its own transaction, plus the version bump"""
+    with SessionLocal() as db:
+        db.query(models.User).filter(models.User.username == username).update(values)
+        versions.auth.bump(db)
+        db.commit()
+
+def user_id(db, username):
+    return db.query(models.User.id).filter(models.User.username == username).scalar()
+
+def test_cached_user_costs_no_queries_within_the_check_interval(client, alice, monkeypatch):
+    monkeypatch.setattr(versions.auth, "check_interval", 60)
+    assert client.get("/auth/me", headers=alice).json()["username"] == "alice"
+    with assert_query_budget(0):
+        assert client.get("/auth/me", headers=alice).status_code == 200
+
+def test_deactivation_by_another_worker_applies_after_the_check_interval(client, alice, monkeypatch):
+    monkeypatch.setattr(versions.auth, "check_interval", 60)
+    assert client.get("/auth/me", headers=alice).status_code == 200
+    set_user("alice", is_active=False)
+    # Within the staleness bound this worker still trusts its cached user
+    assert client.get("/auth/me", headers=alice).status_code == 200
+    monkeypatch.setattr(versions.auth, "check_interval", 0)
+    assert client.get("/auth/me", headers=alice).status_code == 403
+
+def test_demotion_by_another_worker_applies_after_the_check_interval(client, admin, monkeypatch):
+    assert client.get("/api/v1/admin/users", headers=admin).status_code == 200
+    set_user("boss", is_admin=False)
+    monkeypatch.setattr(versions.auth, "check_interval", 0)
+    assert client.get("/api/v1/admin/users", headers=admin).status_code == 403
+
+def test_admin_toggles_apply_at_once(client, db, admin, alice):
+    alice_id = user_id(db, "alice")
+    assert client.get("/auth/me", headers=alice).status_code == 200
+    assert client.patch(f"/api/v1/admin/users/{alice_id}/active", headers=admin).status_code == 200
+    assert client.get("/auth/me", headers=alice).status_code == 403
+    assert client.patch(f"/api/v1/admin/users/{alice_id}/active", headers=admin).status_code == 200
+    assert client.get("/auth/me", headers=alice).status_code == 200
+
+    assert client.get("/api/v1/admin/users", headers=alice).status_code == 403
+    assert client.patch(f"/api/v1/admin/users/{alice_id}/admin", headers=admin).status_code == 200
+    assert client.get("/api/v1/admin/users", headers=alice).status_code == 200
+
+def test_invalid_token(client):
+    assert client.get("/auth/me", headers={"Authorization": "Bearer nope"}).status_code == 401
@@ -0,0 +1,34 @@
+from app import versions
+from app.database import SessionLocal
+
+def test_etag_and_not_modified(client, products):
+    first = client.get("/api/v1/products")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('"catalog-')
+    again = client.get("/api/v1/products", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert client.get("/api/v1/products", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+def test_own_write_changes_validators(client, products):
+    etag = client.get("/api/v1/products").headers["etag"]
+    product = dict(products[0], name="Zebra Brew")
+    product.pop("id")
+    client.put(f"/api/v1/products/{products[0]['id']}", json=product)
+    response = client.get("/api/v1/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert "Zebra Brew" in response.text
+
+def test_other_worker_write_is_noticed(client, products, monkeypatch):
+    """A write made by another process only bumps the shared row"""
+    monkeypatch.setattr(versions.catalog, "check_interval", 0)
+    etag = client.get("/api/v1/products/categories").headers["etag"]
+    with SessionLocal() as db:
+        versions.catalog.bump(db)
+        db.commit()
+    response = client.get("/api/v1/products/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+def test_missing_product_is_404_even_with_current_etag(client, products):
+    etag = client.get(f"/api/v1/products/{products[0]['id']}").headers["etag"]
+    assert client.get(f"/api/v1/products/{products[0]['id']}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/v1/products/999999", headers={"If-None-Match": etag}).status_code == 404
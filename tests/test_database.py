@@ -0,0 +1,55 @@
+import threading
+import pytest
+from sqlalchemy import create_engine, event, exc, text
+from app import database
+from app.config import settings
+
+def file_engine(tmp_path, **options):
+    return create_engine(f"sqlite:///{tmp_path / 'pool.db'}", connect_args={"check_same_thread": False}, **options)
+
+def test_new_connections_get_the_sqlite_pragmas(tmp_path):
+    engine = file_engine(tmp_path)
+    event.listen(engine, "connect", database._apply_sqlite_pragmas)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == settings.sqlite_journal_mode.lower()
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.sqlite_busy_timeout_ms
+
+def test_app_engine_applies_the_pragmas():
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.sqlite_busy_timeout_ms
+
+def test_pool_records_checkout_waits_and_timeouts(tmp_path):
+    engine = file_engine(tmp_path, poolclass=database.InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.3)
+    held = engine.connect()
+    status = database.pool_status(engine)
+    assert (status["size"], status["checked_out"], status["overflow"]) == (1, 1, 0)
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    # The next checkout waits until the held connection is returned
+    release = threading.Timer(0.1, held.close)
+    release.start()
+    with engine.connect():
+        pass
+    release.join()
+
+    status = database.pool_status(engine)
+    assert status["pool"] == "InstrumentedQueuePool"
+    assert (status["checkouts"], status["timeouts"], status["checked_out"]) == (3, 1, 0)
+    # The timed-out checkout waited the full timeout, the last one ~0.1s
+    assert status["wait_seconds_max"] >= 0.29
+    assert status["wait_seconds_total"] >= 0.38
+
+    # Counters survive the pool being recreated (e.g. after a disconnect)
+    engine.dispose()
+    assert database.pool_status(engine)["checkouts"] == 3
+
+def test_health_reports_the_pool(client):
+    body = client.get("/health/db").json()
+    assert body["status"] == "healthy"
+    pool = body["pool"]
+    assert pool["pool"] == "InstrumentedQueuePool"
+    assert pool["size"] == settings.db_pool_size
+    assert pool["checked_out"] == 0
+    assert pool["checkouts"] >= 1
+    assert {"timeouts", "wait_seconds_total", "wait_seconds_avg", "wait_seconds_max"} <= set(pool)
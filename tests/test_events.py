@@ -0,0 +1,164 @@
+import asyncio
+import gc
+import json
+import signal
+from fastapi import HTTPException
+import pytest
+from app import events
+from app.config import settings
+
+def event(order_id, status="preparing"):
+    return {"order_id": order_id, "user_id": 1, "status": status, "previous_status": "pending", "at": "now"}
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def started_broker():
+    broker = events.Broker()
+    broker.loop = asyncio.get_running_loop()
+    broker.backend = events.LocalBackend(broker)
+    return broker
+
+def test_events_reach_the_order_and_all_orders_subscribers():
+    async def scenario():
+        broker = await started_broker()
+        order, other, everything = broker.subscribe(1), broker.subscribe(2), broker.subscribe()
+        broker.dispatch(event(1))
+        return order.queue.qsize(), other.queue.qsize(), everything.queue.qsize()
+    assert run(scenario()) == (1, 0, 1)
+
+def test_slow_subscriber_keeps_the_newest_events():
+    async def scenario():
+        broker = await started_broker()
+        subscription = broker.subscribe(1)
+        for i in range(settings.order_events_queue_size + 3):
+            broker.dispatch({**event(1), "at": i})
+        return [subscription.queue.get_nowait()["at"] for _ in range(subscription.queue.qsize())]
+    kept = run(scenario())
+    assert len(kept) == settings.order_events_queue_size
+    assert kept[-1] == settings.order_events_queue_size + 2
+
+def test_abandoned_subscriptions_are_dropped():
+    async def scenario():
+        broker = await started_broker()
+        broker.subscribe(1)
+        broker.subscribe(2)
+        gc.collect()
+        broker.dispatch(event(1))
+        after_dispatch = set(broker.subscriptions)
+        held = broker.subscribe(3)  # noqa: F841 (alive while counted)
+        return after_dispatch, set(broker.subscriptions), broker.subscriber_count()
+    after_dispatch, after_subscribe, count = run(scenario())
+    assert after_dispatch == {2}
+    assert after_subscribe == {3}
+    assert count == 1
+
+def test_stream_ends_on_final_status_and_on_shutdown():
+    async def scenario():
+        broker = await started_broker()
+        final = broker.subscribe(1)
+        broker.dispatch(event(1))
+        broker.dispatch(event(1, "completed"))
+        chunks = [chunk async for chunk in events.sse_stream(final, event(1, "pending"))]
+
+        everything = broker.subscribe()
+        broker.end_streams()
+        shut = [chunk async for chunk in events.sse_stream(everything)]
+        with pytest.raises(HTTPException) as refused:
+            broker.subscribe(1)
+        return chunks, shut, refused.value.status_code, broker.subscriber_count()
+    chunks, shut, refused, remaining = run(scenario())
+    assert chunks[0] == f"retry: {settings.order_events_retry_ms}\n\n"
+    assert [chunk.split('"status": "')[1].split('"')[0] for chunk in chunks[1:]] == ["pending", "preparing", "completed"]
+    assert shut == [f"retry: {settings.order_events_retry_ms}\n\n"]
+    assert (refused, remaining) == (503, 0)
+
+def test_shutdown_signal_ends_streams_and_reaches_the_server():
+    received = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+
+    async def scenario():
+        broker = events.Broker()
+        await broker.start()
+        subscription = broker.subscribe(1)
+        signal.raise_signal(signal.SIGTERM)
+        ended = await asyncio.wait_for(subscription.queue.get(), 1)
+        await broker.stop()
+        return ended, signal.getsignal(signal.SIGTERM)
+
+    try:
+        ended, handler_after_stop = run(scenario())
+    finally:
+        restored = signal.signal(signal.SIGTERM, original)
+    assert ended is None
+    assert received == [signal.SIGTERM]
+    assert handler_after_stop is restored
+
+def place_order(client, headers, product):
+    order = {"items": [{"product_id": product["id"], "size": product["sizes"][0]}]}
+    return client.post("/api/v1/orders", headers=headers, json=order).json()
+
+def test_order_stream_over_http(client, products, alice, admin, make_user):
+    order = place_order(client, alice, products[0])
+    client.patch(f"/api/v1/orders/{order['id']}/status", params={"status": "completed"}, headers=admin)
+    token = alice["Authorization"].split()[1]
+    # Completed already: the stream sends the current status and ends
+    with client.stream("GET", f"/api/v1/orders/{order['id']}/events", params={"access_token": token}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    assert body.startswith("retry: ")
+    assert '"status": "completed"' in body
+
+    assert client.get(f"/api/v1/orders/{order['id']}/events").status_code == 401
+    assert client.get("/api/v1/orders/999999/events", headers=alice).status_code == 404
+    assert client.get(f"/api/v1/orders/{order['id']}/events", headers=make_user("mallory")).status_code == 404
+    assert events.broker.subscriber_count() == 0
+
+class FakeConnection:
+    """One operation at a time, like an asyncpg connection"""
+
+    def __init__(self, sent):
+        self.sent = sent
+        self.busy = False
+        self.closed = False
+
+    async def execute(self, query, channel, payload):
+        if self.busy:
+            raise RuntimeError("another operation is in progress")
+        self.busy = True
+        await asyncio.sleep(0.01)
+        self.sent.append(payload)
+        self.busy = False
+
+    def is_closed(self):
+        return self.closed
+
+    def terminate(self):
+        self.closed = True
+
+    async def close(self):
+        self.closed = True
+
+def test_postgres_notifies_in_order_without_overlapping():
+    async def scenario():
+        broker = await started_broker()
+        backend = events.PostgresBackend(broker, "postgresql://unused")
+        sent, connections = [], []
+
+        async def connect():
+            connections.append(FakeConnection(sent))
+            return connections[-1]
+
+        backend._connect = connect
+        subscription = broker.subscribe(1)
+        for status in ("preparing", "ready", "completed"):
+            backend.publish(event(1, status))
+        await backend.stop()
+        return sent, len(connections), subscription.queue.qsize(), backend.pending
+    sent, connections, delivered_locally, pending = run(scenario())
+    assert [json.loads(payload)["status"] for payload in sent] == ["preparing", "ready", "completed"]
+    assert connections == 1
+    # Delivery comes back through LISTEN, not as a local fallback
+    assert delivered_locally == 0
+    assert not pending
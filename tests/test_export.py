@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime
+from app import models
+from app.admin_router import CSV_COLUMNS
+
+def place_order(client, headers, *lines):
+    response = client.post("/api/v1/orders", headers=headers, json={"items": [
+        {"product_id": product["id"], "size": product["sizes"][0], "quantity": quantity} for product, quantity in lines
+    ]})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def export(client, headers, **params):
+    return client.get("/api/v1/admin/orders/export", headers=headers, params=params)
+
+def exported_ids(client, headers, **params):
+    response = export(client, headers, **params)
+    assert response.status_code == 200, response.text
+    return [json.loads(line)["id"] for line in response.text.splitlines()]
+
+def test_ndjson_has_one_order_per_line(client, products, alice, admin):
+    first = place_order(client, alice, (products[0], 2))
+    second = place_order(client, alice, (products[1], 1), (products[2], 3))
+    response = export(client, admin)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in response.headers["content-disposition"]
+    orders = [json.loads(line) for line in response.text.splitlines()]
+    assert [order["id"] for order in orders] == [first["id"], second["id"]]
+    assert orders[1]["items"] == second["items"]
+
+def test_csv_has_a_header_and_one_row_per_order_line(client, products, alice, admin):
+    first = place_order(client, alice, (products[0], 2))
+    second = place_order(client, alice, (products[1], 1), (products[2], 3))
+    response = export(client, admin, format="csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == CSV_COLUMNS
+    assert [(int(row[0]), int(row[5]), int(row[7])) for row in rows[1:]] == [
+        (first["id"], products[0]["id"], 2),
+        (second["id"], products[1]["id"], 1),
+        (second["id"], products[2]["id"], 3),
+    ]
+
+def test_filters_by_status_and_creation_time(client, db, products, alice, admin):
+    old = place_order(client, alice, (products[0], 1))
+    new = place_order(client, alice, (products[0], 1))
+    db.query(models.Order).filter(models.Order.id == old["id"]).update({"created_at": datetime(2024, 1, 1)})
+    db.query(models.Order).filter(models.Order.id == new["id"]).update({"created_at": datetime(2024, 6, 1)})
+    db.commit()
+    assert client.patch(f"/api/v1/orders/{new['id']}/status", params={"status": "cancelled"}, headers=admin).status_code == 200
+
+    assert exported_ids(client, admin, status="pending") == [old["id"]]
+    assert exported_ids(client, admin, status="cancelled") == [new["id"]]
+    assert exported_ids(client, admin, since="2024-03-01T00:00:00") == [new["id"]]
+    assert exported_ids(client, admin, until="2024-03-01T00:00:00") == [old["id"]]
+    assert exported_ids(client, admin, since="2024-01-01T00:00:00", until="2024-06-01T00:00:00") == [old["id"]]
+
+def test_invalid_status_is_rejected(client, admin):
+    response = export(client, admin, status="lost")
+    assert response.status_code == 400
+    assert "Invalid status" in response.json()["detail"]
+
+def test_export_is_admin_only(client, alice):
+    assert export(client, {}).status_code == 401
+    assert export(client, alice).status_code == 403
@@ -0,0 +1,33 @@
+from passlib.context import CryptContext
+from app import hashing, models
+from conftest import PASSWORD
+
+def login(client, username):
+    return client.post("/auth/token", data={"username": username, "password": PASSWORD})
+
+def stored_hash(db, username):
+    return db.query(models.User.hashed_password).filter(models.User.username == username).scalar()
+
+def test_sign_ins_beyond_workers_and_queue_are_rejected(client, alice, monkeypatch):
+    executor = hashing.hashing_executor
+    monkeypatch.setattr(executor, "_pending", executor.workers + executor.max_queue)
+    response = login(client, "alice")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+    monkeypatch.setattr(executor, "_pending", executor.workers + executor.max_queue - 1)
+    assert login(client, "alice").status_code == 200
+
+def test_login_rehashes_after_a_rounds_change(client, db, alice, monkeypatch):
+    assert stored_hash(db, "alice").startswith("$2b$04$")
+    monkeypatch.setattr(hashing, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    assert login(client, "alice").status_code == 200
+    db.expire_all()
+    upgraded = stored_hash(db, "alice")
+    assert upgraded.startswith("$2b$05$")
+
+    # The upgraded hash still verifies and isn't rewritten again
+    assert login(client, "alice").status_code == 200
+    db.expire_all()
+    assert stored_hash(db, "alice") == upgraded
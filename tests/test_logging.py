@@ -0,0 +1,20 @@
+import json
+import logging
+from app import logging_config
+from app.config import settings
+
+def test_records_after_shutdown_still_reach_stdout(capsys):
+    logging_config.shutdown_logging()
+    try:
+        logging.getLogger("app.test").warning("late record", extra={"step": "shutdown"})
+        entry = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+        assert entry["message"] == "late record"
+        assert entry["step"] == "shutdown"
+        assert not any(isinstance(h, logging_config.DroppingQueueHandler) for h in logging.getLogger().handlers)
+    finally:
+        logging_config.setup_logging(settings)
+    assert any(isinstance(h, logging_config.DroppingQueueHandler) for h in logging.getLogger().handlers)
+
+def test_access_token_redacted():
+    assert logging_config.redact_query("/api/v1/orders/1/events?access_token=abc&x=1") == \
+        "/api/v1/orders/1/events?access_token=[redacted]&x=1"
@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database import engine
+
+def test_failed_statements_leave_no_timing_state(client):
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        assert not conn.info.get("query_start")
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert not conn.info.get("query_start")
+
+def test_metrics_count_queries(client, products):
+    client.get("/api/v1/products/categories")
+    body = client.get("/metrics").text
+    assert 'db_queries_total{operation="SELECT"}' in body
+    assert 'http_requests_total{method="GET",route="/api/v1/products/categories",status="200"}' in body
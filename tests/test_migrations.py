@@ -0,0 +1,59 @@
+from sqlalchemy import create_engine, inspect, insert, select, text
+from app import migrations, models, pricing
+
+def new_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+def model_schema(tables):
+    return {
+        table.name: ({column.name for column in table.columns}, {index.name for index in table.indexes})
+        for table in tables
+    }
+
+def database_schema(engine, names):
+    inspector = inspect(engine)
+    return {
+        name: ({column["name"] for column in inspector.get_columns(name)}, {index["name"] for index in inspector.get_indexes(name)})
+        for name in names
+    }
+
+def test_fresh_database_matches_the_models(tmp_path):
+    engine = new_engine(tmp_path)
+    assert migrations.upgrade(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.pending(engine) == []
+    assert migrations.upgrade(engine) == []
+
+    tables = models.Base.metadata.sorted_tables
+    assert database_schema(engine, [table.name for table in tables]) == model_schema(tables)
+    with engine.connect() as conn:
+        assert set(conn.execute(select(models.CacheVersion.name)).scalars()) == {"catalog", "auth"}
+
+def test_baseline_does_not_follow_the_models(tmp_path):
+    engine = new_engine(tmp_path)
+    with engine.begin() as conn:
+        migrations.create_tables(conn)
+    assert set(inspect(engine).get_table_names()) == {"coffee_products", "users", "orders"}
+    assert "ix_orders_status" not in {index["name"] for index in inspect(engine).get_indexes("orders")}
+
+def test_legacy_order_lines_are_backfilled(tmp_path):
+    # A database from before versioning: baseline tables, lines in orders.items
+    engine = new_engine(tmp_path)
+    with engine.begin() as conn:
+        migrations.create_tables(conn)
+        conn.execute(insert(migrations._coffee_products).values(
+            id=1, name="Latte", sizes=["Small (8oz)"], prices={"small": 3.5}, is_available=True,
+        ))
+        conn.execute(insert(migrations._users).values(id=1, username="alice", email="alice@example.com"))
+        conn.execute(insert(migrations._orders).values(
+            id=1, user_id=1, total_price=7.0, status="completed",
+            items=[{"product_id": 1, "size": "small", "quantity": 2}, {"size": "small"}],
+        ))
+    migrations.upgrade(engine)
+    # Migrations read the frozen tables, not the app's price cache
+    assert pricing.price_table_cache.stats()["size"] == 0
+
+    with engine.connect() as conn:
+        lines = conn.execute(select(models.OrderItem.order_id, models.OrderItem.size, models.OrderItem.line_total)).all()
+        counters = dict(conn.execute(text("SELECT name, value FROM stats_counters")).all())
+    assert lines == [(1, "Small (8oz)", 7.0)]
+    assert (counters["orders"], counters["orders_completed"], counters["revenue"]) == (1, 1, 7.0)
@@ -0,0 +1,134 @@
+from app import models, stats
+from app.config import settings
+
+def line(product, quantity=1):
+    return {"product_id": product["id"], "size": product["sizes"][0], "quantity": quantity}
+
+def admin_stats(client, admin):
+    return client.get("/api/v1/admin/stats", headers=admin).json()
+
+def test_batch_creates_orders_and_reports_failures_in_order(client, db, products, alice, admin):
+    response = client.post("/api/v1/orders/batch", headers=alice, json={"orders": [
+        {"items": [line(products[0], 2)]},
+        {"items": [{"product_id": 999999, "size": "small"}]},
+        {"items": [line(products[1]), line(products[2])]},
+        {"items": [{"product_id": products[0]["id"], "size": "Huge"}]},
+    ]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+    assert [r["status_code"] for r in body["results"]] == [201, 404, 201, 400]
+
+    first, second = body["results"][0]["order"], body["results"][2]["order"]
+    assert first["items"][0]["quantity"] == 2
+    assert len(second["items"]) == 2
+    assert first["total_price"] == round(sum(i["line_total"] for i in first["items"]), 2)
+
+    # Same rows as the single-order path: readable back, lines stored
+    assert client.get(f"/api/v1/orders/{second['id']}", headers=alice).json()["items"] == second["items"]
+    assert db.query(models.OrderItem).count() == 3
+
+    dashboard = admin_stats(client, admin)
+    assert dashboard["total_orders"] == 2
+    assert dashboard["pending_orders"] == 2
+    assert dashboard["revenue"] == round(first["total_price"] + second["total_price"], 2)
+    assert dashboard == stats.read(stats.recompute(db).items())
+
+def test_batch_where_every_order_fails(client, products, alice):
+    response = client.post("/api/v1/orders/batch", headers=alice, json={"orders": [
+        {"items": [{"product_id": 999999, "size": "small"}]},
+    ]})
+    assert response.json() == {"created": 0, "failed": 1, "results": [
+        {"index": 0, "status_code": 404, "order": None, "error": "Product 999999 not found"},
+    ]}
+
+def test_batch_size_limits(client, products, alice):
+    assert client.post("/api/v1/orders/batch", headers=alice, json={"orders": []}).status_code == 400
+    too_many = [{"items": [line(products[0])]}] * (settings.order_batch_max_size + 1)
+    assert client.post("/api/v1/orders/batch", headers=alice, json={"orders": too_many}).status_code == 400
+
+def test_batch_requires_auth(client, products):
+    assert client.post("/api/v1/orders/batch", json={"orders": [{"items": [line(products[0])]}]}).status_code == 401
+
+def place_order(client, headers, product):
+    response = client.post("/api/v1/orders", headers=headers, json={"items": [line(product)]})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def set_status(client, admin, order_id, status):
+    return client.patch(f"/api/v1/orders/{order_id}/status", params={"status": status}, headers=admin)
+
+def test_status_changes_keep_counters_consistent(client, db, products, alice, admin):
+    orders = [place_order(client, alice, products[0]) for _ in range(3)]
+    for order, status in zip(orders, ["preparing", "cancelled", "completed"]):
+        assert set_status(client, admin, order["id"], status).status_code == 200
+    assert set_status(client, admin, orders[1]["id"], "pending").status_code == 200
+    assert set_status(client, admin, orders[0]["id"], "bogus").status_code == 400
+    assert set_status(client, admin, 999999, "ready").status_code == 404
+    assert set_status(client, alice, orders[0]["id"], "ready").status_code == 403
+
+    dashboard = admin_stats(client, admin)
+    assert dashboard["orders_by_status"]["pending"] == 1
+    assert dashboard["orders_by_status"]["cancelled"] == 0
+    assert dashboard == stats.read(stats.recompute(db).items())
+
+def test_change_committed_after_the_read_is_not_counted_twice(client, db, products, alice, admin, monkeypatch):
+    from app import async_order_router, order_router
+    from app.database import SessionLocal
+    order = place_order(client, alice, products[0])
+    change_status = order_router.change_status
+    competing = []
+
+    def change_after_competing_commit(order_id, old, new):
+        # Another worker moves the order on between this request's read and
+        # its update
+        if not competing:
+            with SessionLocal() as other:
+                other.execute(change_status(order_id, "pending", "cancelled"))
+                stats.bump(other, stats.status_changed("pending", "cancelled", order["total_price"]))
+                other.commit()
+            competing.append(order_id)
+        return change_status(order_id, old, new)
+
+    monkeypatch.setattr(order_router, "change_status", change_after_competing_commit)
+    monkeypatch.setattr(async_order_router, "change_status", change_after_competing_commit)
+    assert set_status(client, admin, order["id"], "preparing").status_code == 200
+
+    dashboard = admin_stats(client, admin)
+    assert dashboard["orders_by_status"]["pending"] == 0
+    assert dashboard["orders_by_status"]["preparing"] == 1
+    assert dashboard["orders_by_status"]["cancelled"] == 0
+    assert dashboard["revenue"] == order["total_price"]
+    assert dashboard == stats.read(stats.recompute(db).items())
+
+def test_recompute_corrects_drift(db, client, products, alice):
+    place_order(client, alice, products[0])
+    stats.bump(db, {"orders": 41, "orders_ready": 2})
+    db.commit()
+    stats.recompute(db)
+    db.commit()
+    counters = dict(db.execute(stats.counters_query()).all())
+    assert (counters["orders"], counters["orders_pending"], counters["orders_ready"]) == (1, 1, 0)
+
+def test_sales_per_product_and_size(client, db, products, alice, admin):
+    first = client.post("/api/v1/orders", headers=alice, json={"items": [line(products[0], 2), line(products[1])]}).json()
+    second = place_order(client, alice, products[0])
+    cancelled = place_order(client, alice, products[2])
+    assert set_status(client, admin, cancelled["id"], "cancelled").status_code == 200
+
+    response = client.get("/api/v1/admin/sales", headers=admin)
+    assert response.status_code == 200, response.text
+    rows = response.json()["items"]
+    # Cancelled orders excluded; most units first
+    assert [(row["product_id"], row["quantity"], row["orders"]) for row in rows] == [
+        (products[0]["id"], 3, 2), (products[1]["id"], 1, 1),
+    ]
+    assert rows[0]["product_name"] == products[0]["name"]
+    assert rows[0]["size"] == first["items"][0]["size"]
+    assert rows[0]["revenue"] == round(first["items"][0]["line_total"] + second["items"][0]["line_total"], 2)
+
+    filtered = client.get("/api/v1/admin/sales", headers=admin, params={"product_id": products[1]["id"]}).json()["items"]
+    assert [row["product_id"] for row in filtered] == [products[1]["id"]]
+    assert client.get("/api/v1/admin/sales", headers=admin, params={"since": "2999-01-01T00:00:00"}).json() == {"items": []}
+    assert client.get("/api/v1/admin/sales", headers=alice).status_code == 403
@@ -0,0 +1,39 @@
+import base64
+import json
+import pytest
+from app.pagination import encode_cursor
+
+def forged(*values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+def test_product_pages_cover_catalog_once(client, products):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/products", params=params).json()
+        seen += [product["id"] for product in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(product["id"] for product in products)
+
+def test_order_history_newest_first(client, products, alice):
+    for _ in range(5):
+        client.post("/api/v1/orders", headers=alice, json={"items": [{"product_id": products[0]["id"], "size": "small"}]})
+    first = client.get("/api/v1/orders", headers=alice, params={"limit": 3}).json()
+    second = client.get("/api/v1/orders", headers=alice, params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    ids = [order["id"] for order in first["items"] + second["items"]]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 5
+    assert second["next_cursor"] is None
+
+@pytest.mark.parametrize("cursor", ["zz!", forged("1"), forged(True), forged(1, 2), forged(None)])
+def test_invalid_product_cursor(client, cursor):
+    assert client.get("/api/v1/products", params={"cursor": cursor}).status_code == 400
+
+@pytest.mark.parametrize("cursor", [forged("2024-01-01T00:00:00", True), forged("yesterday", 1), forged(1, 1)])
+def test_invalid_order_cursor(client, alice, cursor):
+    assert client.get("/api/v1/orders", headers=alice, params={"cursor": cursor}).status_code == 400
+
+def test_valid_cursor_round_trip(client, products):
+    page = client.get("/api/v1/products", params={"cursor": encode_cursor(products[2]["id"])}).json()
+    assert [product["id"] for product in page["items"]] == [product["id"] for product in products[3:]]
@@ -0,0 +1,33 @@
+from app import models, versions
+from app.database import SessionLocal
+
+def order_total(client, headers, product_id):
+    response = client.post("/api/v1/orders", headers=headers, json={"items": [{"product_id": product_id, "size": "small"}]})
+    assert response.status_code == 200, response.text
+    return response.json()["total_price"]
+
+def test_sizes_resolve_to_product_labels(client, products, alice):
+    product = next(p for p in products if len(p["sizes"]) >= 2)
+    response = client.post("/api/v1/orders", headers=alice, json={"items": [
+        {"product_id": product["id"], "size": product["sizes"][0], "quantity": 2},
+        {"product_id": product["id"], "size": product["sizes"][1].split()[0].upper()},
+    ]})
+    lines = response.json()["items"]
+    assert [line["size"] for line in lines] == product["sizes"][:2]
+    assert response.json()["total_price"] == round(sum(line["line_total"] for line in lines), 2)
+
+def test_unknown_size_and_product(client, products, alice):
+    assert client.post("/api/v1/orders", headers=alice, json={"items": [{"product_id": products[0]["id"], "size": "Huge"}]}).status_code == 400
+    assert client.post("/api/v1/orders", headers=alice, json={"items": [{"product_id": 999999, "size": "small"}]}).status_code == 404
+
+def test_price_change_by_another_worker_applies_at_once(client, products, alice):
+    product_id = products[0]["id"]
+    before = order_total(client, alice, product_id)
+    # Another worker's write: the row and the shared version change, this
+    # process's caches are untouched
+    with SessionLocal() as db:
+        product = db.get(models.CoffeeProduct, product_id)
+        product.prices = {**product.prices, "small": product.prices["small"] + 1}
+        versions.catalog.bump(db)
+        db.commit()
+    assert order_total(client, alice, product_id) == round(before + 1, 2)
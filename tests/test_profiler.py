@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import pytest
+from app import profiler
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_profile_samples_running_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,))
+    worker.start()
+    try:
+        profile = asyncio.run(profiler.profile(0.2, 0.005))
+    finally:
+        stop.set()
+        worker.join()
+    report = profile.report()
+    assert report["ticks"] > 0
+    assert "tests.test_profiler:busy" in report["collapsed"]
+    assert profiler.current() is None
+
+def test_one_profile_at_a_time():
+    async def overlapping():
+        first = asyncio.create_task(profiler.profile(0.1, 0.01))
+        await asyncio.sleep(0.01)
+        with pytest.raises(profiler.ProfilerBusy):
+            await profiler.profile(0.1, 0.01)
+        await first
+    asyncio.run(overlapping())
+
+def test_sampler_is_joined_off_the_event_loop(monkeypatch):
+    stopped_in = []
+    stop = profiler.Profile.stop
+
+    def recording_stop(self):
+        stopped_in.append(threading.current_thread())
+        stop(self)
+
+    monkeypatch.setattr(profiler.Profile, "stop", recording_stop)
+    asyncio.run(profiler.profile(0.01, 0.005))
+    assert stopped_in and stopped_in[0] is not threading.main_thread()
+
+def test_admin_endpoint(client, admin, alice):
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers=alice).status_code == 403
+    response = client.get("/api/v1/admin/profile", params={"seconds": 0.1, "interval_ms": 5}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["mode"] == "all"
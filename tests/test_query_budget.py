@@ -0,0 +1,39 @@
+import pytest
+from app import versions
+from app.querylog import assert_query_budget, QueryBudgetExceeded
+
+def place_orders(client, headers, product, count):
+    order = {"items": [{"product_id": product["id"], "size": product["sizes"][0]}] * 2}
+    for _ in range(count):
+        assert client.post("/api/v1/orders", headers=headers, json=order).status_code == 200
+
+def test_order_history_does_not_grow_with_orders(client, products, alice, monkeypatch):
+    # Check the auth version on every request so both pages cost the same
+    monkeypatch.setattr(versions.auth, "check_interval", 0)
+    client.get("/auth/me", headers=alice)  # cache the user
+    place_orders(client, alice, products[0], 1)
+    with assert_query_budget(3) as one:
+        assert len(client.get("/api/v1/orders", headers=alice).json()["items"]) == 1
+    place_orders(client, alice, products[0], 9)
+    # auth version check, the page of orders, their lines in one IN query
+    with assert_query_budget(3) as ten:
+        assert len(client.get("/api/v1/orders", headers=alice).json()["items"]) == 10
+    assert len(one) == len(ten)
+
+def test_exceeding_the_budget_lists_the_statements(client, products):
+    with pytest.raises(QueryBudgetExceeded, match=r"queries issued, budget is 0:\n  1\. SELECT"):
+        with assert_query_budget(0):
+            client.get("/api/v1/products/categories")
+
+def test_server_timing_counts_the_request_queries(client, products, alice):
+    client.get("/auth/me", headers=alice)
+    with assert_query_budget(10) as statements:
+        response = client.get("/api/v1/orders", headers=alice)
+    assert f'desc="{len(statements)} queries"' in response.headers["Server-Timing"]
+
+def test_status_change_does_not_load_order_lines(client, products, alice, admin):
+    order = {"items": [{"product_id": products[0]["id"], "size": products[0]["sizes"][0]}]}
+    order_id = client.post("/api/v1/orders", headers=alice, json=order).json()["id"]
+    with assert_query_budget(10) as statements:
+        client.patch(f"/api/v1/orders/{order_id}/status", params={"status": "ready"}, headers=admin)
+    assert not [statement for statement in statements if "FROM order_items" in statement]
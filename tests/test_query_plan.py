@@ -0,0 +1,89 @@
+"""The routers' hot queries are served by an index.
+
+Runs EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL) on each query against
+the test database and fails when one needs a full table scan. Add a query here
+when a request path gains one. On PostgreSQL sequential scans are disabled for
+the check, so it reports whether an index can serve the query rather than
+what the planner prefers for the tests' tiny tables.
+"""
+import re
+from datetime import datetime
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import models, search
+from app.admin_router import sales_query, export_query
+from app.database import engine
+from app.pagination import after_id, before_created, encode_cursor
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+@compiles(Explain)
+def _explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+def router_queries(dialect: str):
+    """(name, statement) for each query a request path runs"""
+    Order, OrderItem, Product, User = models.Order, models.OrderItem, models.CoffeeProduct, models.User
+    now = datetime.utcnow()
+    queries = [
+        ("products: list page", after_id(
+            select(Product).where(Product.is_available.is_(True)), Product.id, encode_cursor(10), 100
+        )),
+        ("products: list by category", after_id(
+            select(Product).where(Product.category == "Hot Coffee", Product.is_available.is_(True)), Product.id, None, 100
+        )),
+        ("products: get", select(Product).where(Product.id == 1)),
+        ("products: categories", select(Product.category).distinct()),
+        ("pricing: price tables", select(Product.id, Product.sizes, Product.prices).where(Product.id.in_([1, 2, 3]))),
+        ("auth: user by username", select(User).where(User.username == "alice")),
+        ("orders: user history", before_created(
+            select(Order).where(Order.user_id == 1), Order.created_at, Order.id, None, 50
+        )),
+        ("orders: user history next page", before_created(
+            select(Order).where(Order.user_id == 1), Order.created_at, Order.id, encode_cursor(now, 100), 50
+        )),
+        ("orders: get", select(Order).where(Order.id == 1, Order.user_id == 1)),
+        ("orders: lines (selectin)", select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3]))),
+        ("admin: orders", before_created(select(Order), Order.created_at, Order.id, None, 50)),
+        ("admin: orders next page", before_created(select(Order), Order.created_at, Order.id, encode_cursor(now, 100), 50)),
+        ("admin: export by status", export_query("pending")),
+        ("admin: sales for product", sales_query(product_id=1)),
+    ]
+    if dialect == "sqlite":
+        queries.append(("products: search", text(search._SQLITE_QUERY).bindparams(query='"latte"*', limit=20, offset=0)))
+    elif dialect == "postgresql":
+        queries.append(("products: search", text(search._PG_QUERY).bindparams(query="latte:*", limit=20, offset=0)))
+    return queries
+
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+def full_scans(conn, statement):
+    """Return (plan lines, tables read by a full scan)"""
+    if conn.dialect.name == "sqlite":
+        plan = [row.detail for row in conn.execute(Explain(statement))]
+        scans = [match.group(1) for match in map(_SQLITE_FULL_SCAN.match, plan) if match]
+    else:
+        plan = [row[0] for row in conn.execute(Explain(statement))]
+        scans = re.findall(r"Seq Scan on (\w+)", "\n".join(plan))
+    return plan, scans
+
+_QUERIES = router_queries(engine.dialect.name)
+
+@pytest.mark.parametrize("statement", [statement for _, statement in _QUERIES], ids=[name for name, _ in _QUERIES])
+def test_query_uses_an_index(client, statement):
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        plan, scans = full_scans(conn, statement)
+        conn.rollback()
+    assert not scans, f"full scan of {', '.join(scans)}:\n" + "\n".join(plan)
@@ -0,0 +1,92 @@
+import time
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+from app import ratelimit
+from app.config import settings
+from app.ratelimit import SQLiteStorage
+
+def storage(tmp_path, **options):
+    return storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}", **options)
+
+@pytest.fixture
+def mid_window(monkeypatch):
+    """Pin the storage's clock mid-minute: a hit landing just after a window
+    boundary weighs the previous window's hits slightly less, letting one more
+    request through"""
+    now = time.time() // 60 * 60 + 30
+
+    class Clock:
+        @staticmethod
+        def time():
+            return now
+
+    monkeypatch.setattr(ratelimit, "time", Clock)
+
+def test_sqlite_uri_resolves_to_the_storage(tmp_path):
+    assert isinstance(storage(tmp_path), SQLiteStorage)
+    assert storage(tmp_path).check()
+
+def test_incr_get_and_clear(tmp_path):
+    counters = storage(tmp_path)
+    assert counters.incr("k", 60) == 1
+    assert counters.incr("k", 60, amount=2) == 3
+    assert counters.get("k") == 3
+    assert time.time() < counters.get_expiry("k") <= time.time() + 60
+    counters.clear("k")
+    assert counters.get("k") == 0
+
+def test_expired_windows_start_over(tmp_path):
+    counters = storage(tmp_path)
+    counters.incr("k", 1)
+    time.sleep(1.1)
+    assert counters.get("k") == 0
+    assert counters.incr("k", 1) == 1
+
+def test_workers_share_counters(tmp_path, mid_window):
+    # Two storages on one file, as in two gunicorn workers
+    limit = parse("3/minute")
+    first = SlidingWindowCounterRateLimiter(storage(tmp_path))
+    second = SlidingWindowCounterRateLimiter(storage(tmp_path))
+    assert [first.hit(limit, "client"), second.hit(limit, "client"), first.hit(limit, "client")] == [True, True, True]
+    assert not second.hit(limit, "client")
+    assert first.hit(limit, "other client")
+    assert second.get_window_stats(limit, "client").remaining == 0
+
+def test_fixed_window(tmp_path):
+    limiter = FixedWindowRateLimiter(storage(tmp_path))
+    limit = parse("2/minute")
+    assert [limiter.hit(limit, "k") for _ in range(3)] == [True, True, False]
+
+def test_row_cap(tmp_path):
+    counters = storage(tmp_path, max_keys=2, cleanup_interval=0)
+    for key in ("a", "b", "c", "d"):
+        counters.incr(key, 60)
+    assert sum(counters.get(key) for key in ("a", "b", "c", "d")) <= 3
+    assert counters.get("d") == 1
+
+def test_api_answers_429_past_the_limit(client, app, products, alice, mid_window):
+    app.state.limiter.enabled = True
+    order = {"items": [{"product_id": products[0]["id"], "size": products[0]["sizes"][0]}]}
+    statuses = [client.post("/api/v1/orders", headers=alice, json=order).status_code for _ in range(11)]
+    assert statuses == [200] * 10 + [429]
+
+def order_statuses(client, alice, products, forwarded_for):
+    order = {"items": [{"product_id": products[0]["id"], "size": products[0]["sizes"][0]}]}
+    return [
+        client.post("/api/v1/orders", json=order, headers={**alice, "X-Forwarded-For": forwarded_for(i)}).status_code
+        for i in range(11)
+    ]
+
+def test_spoofed_forwarded_for_does_not_reset_the_limit(client, app, products, alice, mid_window, monkeypatch):
+    monkeypatch.setattr(settings, "trusted_proxy_hops", 1)
+    app.state.limiter.enabled = True
+    # The client sends a fresh address each time; the router appends the one it saw
+    statuses = order_statuses(client, alice, products, lambda i: f"10.0.0.{i}, 203.0.113.7")
+    assert statuses == [200] * 10 + [429]
+
+def test_forwarded_for_ignored_without_trusted_proxies(client, app, products, alice, mid_window):
+    app.state.limiter.enabled = True
+    statuses = order_statuses(client, alice, products, lambda i: f"10.0.0.{i}")
+    assert statuses == [200] * 10 + [429]
@@ -0,0 +1,55 @@
+def product_fields(**fields):
+    return {
+        "name": "Cup", "ingredients": ["Espresso"], "category": "Coffee", "description": "A coffee.",
+        "prices": {"small": 3.0}, "sizes": ["Small"], "caffeine_mg": 60, "calories": 5,
+        "preparation_time": 2, "customizations": [], "rating": 4.0, "review_count": 1, **fields,
+    }
+
+def add_product(client, **fields):
+    product = product_fields(**fields)
+    response = client.post("/api/v1/products", json=product)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def search(client, q, **params):
+    response = client.get("/api/v1/products/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [product["id"] for product in response.json()]
+
+def test_name_match_ranks_above_description_match(client):
+    described = add_product(client, name="House Blend", description="Notes of zanzibar spice.")
+    named = add_product(client, name="Zanzibar Latte")
+    assert search(client, "zanzibar") == [named["id"], described["id"]]
+
+def test_matches_ingredients_and_category(client):
+    spiced = add_product(client, name="Winter Cup", ingredients=["Espresso", "Cardamom"])
+    tea = add_product(client, name="Leaf Cup", category="Tisane")
+    add_product(client, name="Plain Cup")
+    assert search(client, "cardamom") == [spiced["id"]]
+    assert search(client, "tisane") == [tea["id"]]
+    # Prefix matching, several tokens all required
+    assert search(client, "carda winter") == [spiced["id"]]
+
+def test_index_follows_updates_and_deletes(client):
+    product = add_product(client, name="Marzipan Mocha")
+    assert search(client, "marzipan") == [product["id"]]
+
+    renamed = product_fields(name="Hazelnut Mocha")
+    assert client.put(f"/api/v1/products/{product['id']}", json=renamed).status_code == 200
+    assert search(client, "marzipan") == []
+    assert search(client, "hazelnut") == [product["id"]]
+
+    assert client.delete(f"/api/v1/products/{product['id']}").status_code == 200
+    assert search(client, "hazelnut") == []
+
+def test_skip_and_limit_page_through_the_ranking(client):
+    ids = [add_product(client, name=f"Quokka Brew {n}")["id"] for n in range(5)]
+    search_ids = search(client, "quokka")
+    assert sorted(search_ids) == sorted(ids)
+    assert search(client, "quokka", limit=2) == search_ids[:2]
+    assert search(client, "quokka", skip=2, limit=2) == search_ids[2:4]
+    assert search(client, "quokka", skip=5) == []
+
+def test_query_validation(client):
+    assert client.get("/api/v1/products/search", params={"q": "a"}).status_code == 422
+    assert search(client, "!!") == []